@@ -2,10 +2,12 @@ import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage
 from langgraph.graph import MessagesState, StateGraph, END  # ← Bon END !
+from agents_runtime.cli import parse_runtime_args, runtime_session
 from nodes import run_agent_reasoning, tool_node
 
 load_dotenv()
@@ -40,19 +42,22 @@ except Exception as e:
     print(f"⚠️ Impossible de générer l'image du graphe: {e}")
 
 if __name__ == "__main__":
+    args = parse_runtime_args("LangGraph ReAct agent")
     print("\n" + "=" * 50)
     print("🚀 Lancement de l'agent ReAct LangGraph")
     print("=" * 50 + "\n")
 
-    result = app.invoke(
-        {
-            "messages": [
-                HumanMessage(
-                    content="C'est quoi la météo le 16/12/2025 à Paris saint-lazare ? Triple cette valeur."
-                )
-            ]
-        }
-    )
+    with runtime_session(args, "react") as config:
+        result = app.invoke(
+            {
+                "messages": [
+                    HumanMessage(
+                        content="C'est quoi la météo le 16/12/2025 à Paris saint-lazare ? Triple cette valeur."
+                    )
+                ]
+            },
+            config=config,
+        )
 
     print("\n" + "=" * 50)
     print("📤 Réponse finale:")
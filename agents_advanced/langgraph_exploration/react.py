@@ -1,3 +1,8 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, END, START
 from langgraph.prebuilt import create_react_agent
@@ -5,6 +10,8 @@ from langchain_openai import ChatOpenAI
 from langchain_core.tools import tool
 from langchain_tavily import TavilySearch
 
+from agents_runtime.resilience import resilient
+
 load_dotenv()
 
 
@@ -16,6 +23,9 @@ def triple(num: float) -> float:
 
 tools = [TavilySearch(max_results=3), triple]
 
-llm = ChatOpenAI(model="gpt-5", temperature=0).bind_tools(tools)
+# timeout adaptatif, requête hedgée et retries avec jitter pour le node agent_reason
+llm = resilient(
+    "agent_reason", ChatOpenAI(model="gpt-5", temperature=0, max_retries=0)
+).bind_tools(tools)
 
 print(f"✅ react.py chargé - Tools: {[t.name for t in tools]}")
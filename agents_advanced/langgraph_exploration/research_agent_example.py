@@ -13,12 +13,16 @@
 # - L'évolution de la réponse
 # =============================================================================
 
+import json
+import os
+import re
 import sys
 from pathlib import Path
 from typing import TypedDict, Annotated
 from datetime import datetime
 
 sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
 from dotenv import load_dotenv
 
@@ -29,6 +33,18 @@ from langgraph.graph.message import add_messages
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
 from langchain_tavily import TavilySearch
+from pydantic import BaseModel, Field
+
+from agents_runtime.budget import (
+    BudgetLimits,
+    BudgetUsage,
+    add_usage,
+    format_usage,
+    usage_from_message,
+)
+from agents_runtime.cascade import node_cascade
+from agents_runtime.cli import parse_runtime_args, runtime_session
+from agents_runtime.resilience import resilient
 
 # =============================================================================
 # 1. STATE CUSTOM - On définit TOUT ce qu'on veut tracker
@@ -56,6 +72,18 @@ class ResearchState(TypedDict):
     # Compteur de recherches effectuées
     search_count: int
 
+    # Requêtes déjà envoyées à Tavily (normalisées) - jamais rejouées
+    search_queries: list[str]
+
+    # URLs apportées par la dernière recherche - 0 en relance : rien à réanalyser
+    new_sources_count: int
+
+    # Ce qui manquait à la dernière analyse - guide la relance
+    knowledge_gaps: list[str]
+
+    # Faits extraits par source (url → faits) - une source n'est lue qu'une fois
+    source_facts: dict[str, list[str]]
+
     # Le résumé final généré
     final_summary: str
 
@@ -65,6 +93,9 @@ class ResearchState(TypedDict):
     # Étape actuelle pour debug
     current_step: str
 
+    # Consommation du run (tokens + recherches) - sommée par add_usage
+    budget: Annotated[BudgetUsage, add_usage]
+
 
 # =============================================================================
 # 2. CONFIGURATION
@@ -73,87 +104,318 @@ class ResearchState(TypedDict):
 # Le LLM pour analyser et rédiger
 llm = ChatOpenAI(model="gpt-4o", temperature=0)
 
+
+def analyse_valide(message: AIMessage) -> bool:
+    """L'analyse doit contenir un JSON avec une confiance entre 1 et 10."""
+    match = re.search(r'"confidence":\s*(\d+)', message.content)
+    return match is not None and 1 <= int(match.group(1)) <= 10
+
+
+# Le scoring de confiance passe d'abord par un petit modèle :
+# gpt-4o seulement si le JSON est invalide ou si le petit modèle hésite.
+# resilient() ajoute timeout adaptatif (p95), requête hedgée et retries avec jitter
+llm_analyse = resilient(
+    "analyse",
+    node_cascade(
+        "analyse", validate=analyse_valide, min_confidence=0.7, temperature=0, max_retries=0
+    ),
+)
+
 # Le tool de recherche web
 tavily = TavilySearch(max_results=3)
 
+# Reformulation des requêtes de relance : tâche simple, petit modèle
+llm_reformulation = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+
+# Nombre max de requêtes reformulées par relance
+MAX_REQUETES_RELANCE = 2
+
+# Sources données à l'analyse (les premières trouvées + celles des relances)
+MAX_SOURCES_ANALYSE = 6
+
+# Mode d'analyse :
+# - "map_reduce" : extraction des faits source par source, en parallèle (MAP),
+#   puis une synthèse sur les faits (REDUCE) → toutes les sources sont lues
+# - "direct" : un seul prompt avec les MAX_SOURCES_ANALYSE premières sources
+MODE_ANALYSE = os.getenv("RESEARCH_ANALYSE_MODE", "map_reduce")
+
+# Extractions simultanées au plus (rate limit de l'API)
+MAX_EXTRACTIONS_PARALLELES = int(os.getenv("RESEARCH_MAX_CONCURRENCY", "10"))
+
+# L'extraction des faits d'une source : tâche simple, petit modèle
+llm_extraction = resilient(
+    "extraction", ChatOpenAI(model="gpt-4o-mini", temperature=0, max_retries=0)
+)
+
+# Instructions statiques en message system, en tête de chaque prompt : le début
+# du prompt est identique d'un appel à l'autre et profite du prompt cache
+# d'OpenAI. Les valeurs qui changent (question, sources) viennent après.
+SYSTEM_EXTRACTION = """Tu lis une source web pour un assistant de recherche.
+Extrais de la source les faits utiles pour répondre à la question : courts,
+vérifiables, sans interprétation. Note la pertinence de la source pour la question."""
+
+SYSTEM_ANALYSE = """Tu es un analyste expert. Réponds uniquement en JSON valide.
+
+Analyse les sources fournies pour répondre à la question, au format :
+{"confidence": 1-10, "key_facts": ["fait 1", "fait 2"], "gaps": ["information manquante 1"], "analysis": "ton analyse"}
+
+"gaps" liste ce que les sources ne disent pas et qu'il faudrait chercher pour mieux répondre."""
+
+SYSTEM_RAPPORT = """Tu es un rédacteur expert. Structure tes réponses clairement.
+
+Génère un rapport structuré avec :
+1. **Réponse courte** (2-3 phrases)
+2. **Points clés** (liste à puces)
+3. **Limites** (ce qu'on ne sait pas)
+
+Sois concis et factuel."""
+
+# Budget max d'un run (surchargeable via AGENT_BUDGET_MAX_TOTAL_TOKENS, etc.)
+# La limite de recherches n'empêche que la relance : le rapport n'en fait aucune
+BUDGET_LIMITS = BudgetLimits.from_env(max_total_tokens=15_000, max_search_calls=3)
+
+
+def budget_tokens_atteint(state: ResearchState) -> list[str]:
+    """Les limites atteintes qui interdisent tout nouvel appel LLM (tokens)."""
+    return [
+        name for name in BUDGET_LIMITS.exceeded(state.get("budget")) if name != "max_search_calls"
+    ]
+
 
 # =============================================================================
 # 3. LES NODES - Chaque étape du workflow
 # =============================================================================
 
 
-def recherche_web(state: ResearchState) -> dict:
+class Reformulations(BaseModel):
+    """Requêtes web pour combler les lacunes de l'analyse."""
+
+    queries: list[str] = Field(
+        description=f"au plus {MAX_REQUETES_RELANCE} requêtes courtes, une par lacune"
+    )
+
+
+def normalise_requete(query: str) -> str:
+    """Clé de comparaison des requêtes (casse et espaces ignorés)."""
+    return " ".join(query.lower().split())
+
+
+def parse_resultats(results) -> list[dict]:
+    """Sources {url, title, content} d'une réponse TavilySearch."""
+    if isinstance(results, dict):
+        # TavilySearch retourne {"query": ..., "results": [{url, title, content, score}, ...]}
+        return results.get("results", [])
+    if isinstance(results, list):
+        return results
+    # Si c'est une string, on crée une source fictive
+    return [{"url": "tavily_search", "title": "Résultats", "content": str(results)}]
+
+
+def requetes_de_relance(state: ResearchState) -> tuple[list[str], BudgetUsage]:
     """
-    NODE 1 : Fait une recherche web avec Tavily.
+    Reformule la question à partir des lacunes de la dernière analyse.
 
-    Entrée : La question de l'utilisateur
-    Sortie : Liste de sources avec leurs contenus
+    Relancer la question d'origine redonnerait les mêmes pages : on cherche
+    seulement ce qui manque.
     """
-    print(f"\n🔍 RECHERCHE WEB pour : '{state['user_question']}'")
+    gaps = state["knowledge_gaps"]
+    prompt = f"""Question : "{state['user_question']}"
 
-    # Appel à Tavily
-    results = tavily.invoke(state["user_question"])
+Requêtes déjà faites :
+{chr(10).join(f"- {q}" for q in state["search_queries"])}
 
-    # Tavily retourne une string, on la parse
-    # En vrai, TavilySearch retourne directement les résultats structurés
-    # mais pour l'exemple on simule la structure
+Informations manquantes après analyse des sources :
+{chr(10).join(f"- {gap}" for gap in gaps) or "- (non précisées : la confiance est trop basse)"}
 
-    sources = []
-    if isinstance(results, str):
-        # Si c'est une string, on crée une source fictive
-        sources = [{"url": "tavily_search", "title": "Résultats", "content": results}]
-    elif isinstance(results, list):
-        sources = results
-    else:
-        sources = [{"url": "unknown", "title": "Résultat", "content": str(results)}]
+Propose de nouvelles requêtes web, différentes des précédentes, qui trouvent ces informations."""
 
-    print(f"   ✅ {len(sources)} source(s) trouvée(s)")
-    for i, src in enumerate(sources[:3]):
-        if isinstance(src, dict):
-            print(f"   {i+1}. {src.get('title', src.get('url', 'Source'))[:50]}...")
+    response = llm_reformulation.with_structured_output(Reformulations, include_raw=True).invoke(
+        prompt
+    )
+    queries = response["parsed"].queries if response["parsed"] else []
+    return queries, usage_from_message(response["raw"])
+
+
+def recherche_web(state: ResearchState) -> dict:
+    """
+    NODE 1 : Fait une recherche web avec Tavily.
+
+    Entrée : La question de l'utilisateur (ou, en relance, les lacunes de l'analyse)
+    Sortie : Les sources déjà connues + les nouvelles
+    """
+    usage: BudgetUsage = {}
+    if state["search_count"] == 0:
+        candidates = [state["user_question"]]
+    else:
+        candidates, usage = requetes_de_relance(state)
+
+    # Une requête déjà faite redonnerait les mêmes résultats : on la saute
+    seen = set(state["search_queries"])
+    queries = []
+    for query in candidates:
+        if normalise_requete(query) not in seen:
+            seen.add(normalise_requete(query))
+            queries.append(query)
+    if state["search_count"]:
+        # la relance reste dans le budget de recherches
+        limit = MAX_REQUETES_RELANCE
+        if BUDGET_LIMITS.max_search_calls is not None:
+            used = (state.get("budget") or {}).get("search_calls", 0)
+            limit = min(limit, max(0, BUDGET_LIMITS.max_search_calls - used))
+        queries = queries[:limit]
+    # seules les requêtes réellement envoyées sont mémorisées
+    done = [*state["search_queries"], *(normalise_requete(query) for query in queries)]
+
+    skipped = [query for query in candidates if normalise_requete(query) in state["search_queries"]]
+    for query in skipped:
+        print(f"\n↺ Requête déjà faite, sautée : '{query}'")
+    for query in queries:
+        print(f"\n🔍 RECHERCHE WEB pour : '{query}'")
+
+    # Appels à Tavily (en parallèle s'il y a plusieurs requêtes)
+    results = tavily.batch(queries) if queries else []
+
+    # On garde les sources déjà analysées et on n'ajoute que les nouvelles URLs
+    sources = list(state["sources_found"])
+    known_urls = {src.get("url") for src in sources}
+    new_sources = []
+    for result in results:
+        for src in parse_resultats(result):
+            if src.get("url") not in known_urls:
+                known_urls.add(src.get("url"))
+                new_sources.append(src)
+    sources.extend(new_sources)
+
+    print(f"   ✅ {len(new_sources)} nouvelle(s) source(s), {len(sources)} au total")
+    for i, src in enumerate(new_sources):
+        print(f"   {i+1}. {src.get('title', src.get('url', 'Source'))[:50]}...")
 
     # On retourne les modifications du State
-    return {
+    update = {
         "sources_found": sources,
         "search_count": state["search_count"] + 1,
+        "search_queries": done,
+        "new_sources_count": len(new_sources),
         "current_step": "recherche_terminée",
-        "messages": [
-            AIMessage(content=f"J'ai trouvé {len(sources)} source(s) pertinente(s).")
-        ],
+        "budget": add_usage(usage, {"search_calls": len(queries)}),
     }
+    # une relance sans nouvelle source laisse la dernière analyse en fin de conversation
+    # (la clôture la reprend comme résumé)
+    if new_sources or not state["search_count"]:
+        update["messages"] = [
+            AIMessage(
+                content=f"J'ai trouvé {len(new_sources)} nouvelle(s) source(s) pertinente(s)."
+            )
+        ]
+    return update
 
 
-def analyse_sources(state: ResearchState) -> dict:
+def lacunes(content: str) -> list[str]:
+    """Les "gaps" du JSON d'analyse, [] si le JSON est illisible."""
+    match = re.search(r"\{.*\}", content, re.DOTALL)
+    if not match:
+        return []
+    try:
+        gaps = json.loads(match.group(0)).get("gaps", [])
+    except (json.JSONDecodeError, AttributeError):
+        return []
+    return [str(gap) for gap in gaps if gap]
+
+
+class FaitsSource(BaseModel):
+    """Faits d'une source utiles pour répondre à la question."""
+
+    faits: list[str] = Field(description="au plus 5 faits courts et vérifiables, tirés de la source")
+    pertinence: int = Field(description="pertinence de la source pour la question, de 1 à 10")
+
+
+def extrait_faits(state: ResearchState) -> tuple[dict[str, list[str]], BudgetUsage]:
     """
-    NODE 2 : Analyse les sources avec le LLM.
+    MAP : extrait les faits de chaque source pas encore lue.
 
-    Entrée : Les sources trouvées
-    Sortie : Un score de confiance et une analyse
+    Un appel court par source, jusqu'à MAX_EXTRACTIONS_PARALLELES en même temps :
+    la latence dépend du nombre de vagues, pas du nombre de sources.
+    Les sources déjà lues (relance) gardent leurs faits.
     """
-    print(f"\n🧠 ANALYSE des {len(state['sources_found'])} sources...")
+    source_facts = dict(state["source_facts"])
+    a_lire = [src for src in state["sources_found"] if src.get("url") not in source_facts]
+    if not a_lire:
+        return source_facts, {}
 
-    # Prépare le contexte pour le LLM
-    sources_text = "\n\n".join(
+    prompts = [
         [
-            f"Source {i+1}:\n{src.get('content', str(src))[:500]}"
-            for i, src in enumerate(state["sources_found"][:3])
+            SystemMessage(content=SYSTEM_EXTRACTION),
+            HumanMessage(
+                content=f"""Question : "{state['user_question']}"
+
+Source : {src.get('title', '')} ({src.get('url', '')})
+{src.get('content', str(src))[:2000]}"""
+            ),
         ]
+        for src in a_lire
+    ]
+    responses = llm_extraction.with_structured_output(FaitsSource, include_raw=True).batch(
+        prompts,
+        config={"max_concurrency": MAX_EXTRACTIONS_PARALLELES},
+        # une source en échec ne bloque pas l'analyse, elle sera relue au prochain passage
+        return_exceptions=True,
     )
 
-    analysis_prompt = f"""Analyse ces sources pour répondre à la question : "{state['user_question']}"
+    usage: BudgetUsage = {}
+    for src, response in zip(a_lire, responses, strict=True):
+        if isinstance(response, Exception):
+            print(f"   ⚠️ Extraction impossible ({src.get('url')}) : {response}")
+            continue
+        usage = add_usage(usage, usage_from_message(response["raw"]))
+        parsed = response["parsed"]
+        if parsed is None:
+            # réponse illisible : comme une exception, la source sera relue
+            print(f"   ⚠️ Extraction illisible ({src.get('url')}) : {response['parsing_error']}")
+            continue
+        # une source hors sujet est lue, mais n'apporte rien à la synthèse
+        source_facts[src.get("url")] = parsed.faits if parsed.pertinence >= 3 else []
+
+    print(f"   🗂️ MAP : {len(a_lire)} source(s) lue(s) en parallèle")
+    return source_facts, usage
 
-SOURCES :
-{sources_text}
 
-Réponds en JSON avec ce format :
-{{"confidence": 1-10, "key_facts": ["fait 1", "fait 2"], "analysis": "ton analyse"}}
+def analyse_sources(state: ResearchState) -> dict:
+    """
+    NODE 2 : Analyse les sources avec le LLM.
+
+    Entrée : Les sources trouvées
+    Sortie : Un score de confiance et une analyse
+    """
+    print(f"\n🧠 ANALYSE des {len(state['sources_found'])} sources ({MODE_ANALYSE})...")
+
+    source_facts, usage = state["source_facts"], {}
+    if MODE_ANALYSE == "map_reduce":
+        # REDUCE : la synthèse ne lit que les faits extraits, pas les pages
+        source_facts, usage = extrait_faits(state)
+        sources_text = "\n\n".join(
+            f"Source {i+1} ({src.get('url')}):\n"
+            + "\n".join(f"- {fait}" for fait in source_facts.get(src.get("url"), []))
+            for i, src in enumerate(state["sources_found"])
+            if source_facts.get(src.get("url"))
+        )
+    else:
+        # Prépare le contexte pour le LLM (les sources des relances en font partie)
+        sources_text = "\n\n".join(
+            [
+                f"Source {i+1}:\n{src.get('content', str(src))[:500]}"
+                for i, src in enumerate(state["sources_found"][:MAX_SOURCES_ANALYSE])
+            ]
+        )
+
+    analysis_prompt = f"""Question : "{state['user_question']}"
+
+SOURCES :
+{sources_text or "(aucune information exploitable)"}
 """
 
-    response = llm.invoke(
+    response = llm_analyse.invoke(
         [
-            SystemMessage(
-                content="Tu es un analyste expert. Réponds uniquement en JSON valide."
-            ),
+            SystemMessage(content=SYSTEM_ANALYSE),
             HumanMessage(content=analysis_prompt),
         ]
     )
@@ -173,11 +435,18 @@ Réponds en JSON avec ce format :
         except:
             pass
 
+    gaps = lacunes(content)
+
     print(f"   ✅ Analyse terminée - Confiance : {confidence}/10")
+    for gap in gaps:
+        print(f"   ❓ {gap}")
 
     return {
         "confidence_score": confidence,
+        "knowledge_gaps": gaps,
+        "source_facts": source_facts,
         "current_step": "analyse_terminée",
+        "budget": add_usage(usage, usage_from_message(response)),
         "messages": [
             AIMessage(
                 content=f"Analyse terminée. Confiance : {confidence}/10\n{content}"
@@ -198,20 +467,11 @@ def genere_rapport(state: ResearchState) -> dict:
     rapport_prompt = f"""Question originale : {state['user_question']}
 
 Basé sur {len(state['sources_found'])} sources analysées avec une confiance de {state['confidence_score']}/10.
-
-Génère un rapport structuré avec :
-1. **Réponse courte** (2-3 phrases)
-2. **Points clés** (liste à puces)
-3. **Limites** (ce qu'on ne sait pas)
-
-Sois concis et factuel.
 """
 
     response = llm.invoke(
         [
-            SystemMessage(
-                content="Tu es un rédacteur expert. Structure tes réponses clairement."
-            ),
+            SystemMessage(content=SYSTEM_RAPPORT),
             HumanMessage(content=rapport_prompt),
         ]
     )
@@ -221,28 +481,74 @@ Sois concis et factuel.
     return {
         "final_summary": response.content,
         "current_step": "rapport_généré",
+        "budget": usage_from_message(response),
         "messages": [response],
     }
 
 
+def cloture_budget(state: ResearchState) -> dict:
+    """
+    NODE 4 : Termine proprement quand le budget est épuisé.
+
+    Pas d'appel LLM ici : la dernière analyse devient le résumé final,
+    c'est la meilleure réponse qu'on ait pour ce budget.
+    """
+    print("\n💸 CLÔTURE : budget épuisé, on garde la dernière analyse")
+
+    return {
+        "final_summary": state["messages"][-1].content,
+        "current_step": "budget_épuisé",
+    }
+
+
 # =============================================================================
 # 4. CONDITIONS - Logique de décision
 # =============================================================================
 
 
+def faut_il_analyser(state: ResearchState) -> str:
+    """
+    Décide si la recherche apporte de quoi refaire une analyse.
+
+    Logique :
+    - Première recherche, ou nouvelles sources → analyse
+    - Relance sans nouvelle URL → l'analyse serait identique : clôture si le
+      budget de tokens est atteint, sinon rapport sur la dernière analyse
+    """
+    if state["search_count"] == 1 or state["new_sources_count"]:
+        return "analyse"
+
+    print("\n🤔 DÉCISION : aucune nouvelle source, la dernière analyse reste valable")
+    if reached := budget_tokens_atteint(state):
+        print(f"   → Budget atteint ({', '.join(reached)}), clôture")
+        return "cloture"
+
+    print("   → Génération du rapport")
+    return "rapport"
+
+
 def faut_il_reanalyser(state: ResearchState) -> str:
     """
     Décide si on doit refaire une analyse ou passer au rapport.
 
     Logique :
-    - Si confiance < 5 ET moins de 2 recherches → refaire une recherche
+    - Si le budget de tokens du run est atteint → clôture sans nouvel appel
+    - Si confiance < 5 ET moins de 2 recherches ET budget de recherches
+      restant → refaire une recherche
     - Sinon → générer le rapport
     """
     print(
         f"\n🤔 DÉCISION : Confiance={state['confidence_score']}, Recherches={state['search_count']}"
     )
 
+    if reached := budget_tokens_atteint(state):
+        print(f"   → Budget atteint ({', '.join(reached)}), clôture")
+        return "cloture"
+
     if state["confidence_score"] < 5 and state["search_count"] < 2:
+        if "max_search_calls" in BUDGET_LIMITS.exceeded(state.get("budget")):
+            print("   → Confiance basse, mais plus de recherche au budget : rapport")
+            return "rapport"
         print("   → Confiance trop basse, nouvelle recherche")
         return "recherche"
 
@@ -261,12 +567,21 @@ graph = StateGraph(ResearchState)
 graph.add_node("recherche", recherche_web)
 graph.add_node("analyse", analyse_sources)
 graph.add_node("rapport", genere_rapport)
+graph.add_node("cloture", cloture_budget)
 
 # Point d'entrée : on commence par la recherche
 graph.set_entry_point("recherche")
 
-# Après recherche → toujours analyse
-graph.add_edge("recherche", "analyse")
+# Après recherche → analyse, sauf relance sans nouvelle source
+graph.add_conditional_edges(
+    "recherche",
+    faut_il_analyser,
+    {
+        "analyse": "analyse",  # Nouvelles sources à analyser
+        "rapport": "rapport",  # Rien de nouveau : rapport sur la dernière analyse
+        "cloture": "cloture",  # Rien de nouveau et budget épuisé
+    },
+)
 
 # Après analyse → décision (refaire recherche ou générer rapport)
 graph.add_conditional_edges(
@@ -275,11 +590,13 @@ graph.add_conditional_edges(
     {
         "recherche": "recherche",  # Boucle si confiance basse
         "rapport": "rapport",  # Sinon rapport final
+        "cloture": "cloture",  # Budget épuisé
     },
 )
 
-# Après rapport → FIN
+# Après rapport (ou clôture budget) → FIN
 graph.add_edge("rapport", END)
+graph.add_edge("cloture", END)
 
 # Compilation
 app = graph.compile()
@@ -297,6 +614,7 @@ except Exception as e:
 # =============================================================================
 
 if __name__ == "__main__":
+    args = parse_runtime_args("Agent de recherche (State custom)")
     print("\n" + "=" * 60)
     print("🚀 AGENT DE RECHERCHE - Exemple avec State Custom")
     print("=" * 60)
@@ -310,16 +628,22 @@ if __name__ == "__main__":
         "user_question": question,
         "sources_found": [],  # Vide au départ
         "search_count": 0,  # Pas encore de recherche
+        "search_queries": [],  # Aucune requête envoyée
+        "new_sources_count": 0,  # Pas encore de source
+        "knowledge_gaps": [],  # Pas encore d'analyse
+        "source_facts": {},  # Aucune source lue
         "final_summary": "",  # Pas encore de résumé
         "confidence_score": 0,  # Pas encore de score
         "current_step": "démarrage",  # Étape initiale
+        "budget": {},  # Rien consommé
     }
 
     print(f"\n📋 Question : {question}")
     print("-" * 60)
 
-    # Exécution de l'agent
-    result = app.invoke(initial_state)
+    # Exécution de l'agent (--profile pour mesurer CPU vs attente réseau par node)
+    with runtime_session(args, "research") as config:
+        result = app.invoke(initial_state, config=config)
 
     # ==========================================================================
     # AFFICHAGE DU RÉSULTAT - Grâce au State custom, on a TOUT
@@ -332,9 +656,11 @@ if __name__ == "__main__":
     print(f"\n🔢 Statistiques :")
     print(f"   • Recherches effectuées : {result['search_count']}")
     print(f"   • Sources trouvées : {len(result['sources_found'])}")
+    print(f"   • Requêtes : {', '.join(result['search_queries'])}")
     print(f"   • Score de confiance : {result['confidence_score']}/10")
     print(f"   • Étape finale : {result['current_step']}")
     print(f"   • Messages générés : {len(result['messages'])}")
+    print(f"   • Budget : {format_usage(result['budget'], BUDGET_LIMITS)}")
 
     print(f"\n📝 Rapport final :")
     print("-" * 60)
@@ -1,8 +1,15 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
 from dotenv import load_dotenv
 from langchain_core.outputs import generation
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_openai import ChatOpenAI
 
+from agents_runtime.cascade import node_cascade
+
 load_dotenv()
 
 reflection_prompt = ChatPromptTemplate.from_messages(
@@ -30,5 +37,13 @@ generation_prompt = ChatPromptTemplate.from_messages(
 
 llm = ChatOpenAI()
 
+# the critique rarely needs a large model: gpt-4o-mini first, gpt-4o when the
+# critique is too short to hold detailed recommendations or the model hesitates
+reflect_llm = node_cascade(
+    "reflect",
+    validate=lambda message: len(message.content.split()) >= 40,
+    min_confidence=0.6,
+)
+
 generate_chain = generation_prompt | llm
-reflect_chain = reflection_prompt | llm
+reflect_chain = reflection_prompt | reflect_llm
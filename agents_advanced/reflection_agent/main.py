@@ -1,9 +1,22 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
 from dotenv import load_dotenv
 from typing import TypedDict, Annotated
 from langchain_core.messages import BaseMessage, HumanMessage
 from langgraph.graph import END, StateGraph
 from langgraph.graph.message import add_messages
 
+from agents_runtime.budget import (
+    BudgetLimits,
+    BudgetUsage,
+    add_usage,
+    format_usage,
+    usage_from_message,
+)
+from agents_runtime.cli import parse_runtime_args, runtime_session
 from chains import generate_chain, reflect_chain
 
 load_dotenv()
@@ -11,24 +24,31 @@ load_dotenv()
 
 class MessageGraph(TypedDict):
     messages: Annotated[list[BaseMessage], add_messages]
+    budget: Annotated[BudgetUsage, add_usage]
 
 
 REFLECT = "reflect"
 GENERATE = "generate"
+BUDGET_LIMITS = BudgetLimits.from_env(max_total_tokens=20_000)
 
 
 def generation_node(state: MessageGraph):
-    return {"messages": [generate_chain.invoke({"messages": state["messages"]})]}
+    res = generate_chain.invoke({"messages": state["messages"]})
+    return {"messages": [res], "budget": usage_from_message(res)}
 
 
 def reflection_node(state: MessageGraph):
     res = reflect_chain.invoke({"messages": state["messages"]})
-    return {"messages": [HumanMessage(content=res.content)]}
+    return {"messages": [HumanMessage(content=res.content)], "budget": usage_from_message(res)}
 
 
 def should_continue(state: MessageGraph):
     if len(state["messages"]) > 6:  # condition arbitraire pour continuer
         return END
+    if reached := BUDGET_LIMITS.exceeded(state.get("budget")):
+        # the last message is a generation: it is the best tweet so far
+        print(f"💸 Budget atteint ({', '.join(reached)}), arrêt sur la dernière version")
+        return END
     return REFLECT
 
 
@@ -49,6 +69,7 @@ except Exception as e:
     print(f"⚠️ Impossible de générer l'image du graphe: {e}")
 
 if __name__ == "__main__":
+    args = parse_runtime_args("Reflection agent")
     print("Hello boss, let's do it")
     inputs = HumanMessage(
         content="""
@@ -59,10 +80,12 @@ if __name__ == "__main__":
     @sport
     """
     )
-    response = graph.invoke({"messages": [inputs]})  # ← Dict avec clé "messages" !
+    with runtime_session(args, "reflection") as config:
+        response = graph.invoke({"messages": [inputs]}, config=config)  # ← Dict avec clé "messages" !
 
     # Affichage propre du résultat final
     print("\n" + "=" * 50)
     print("🐦 TWEET FINAL:")
     print("=" * 50)
     print(response["messages"][-1].content)
+    print(f"\n💸 Budget : {format_usage(response['budget'], BUDGET_LIMITS)}")
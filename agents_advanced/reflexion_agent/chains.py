@@ -4,6 +4,7 @@ from datetime import datetime
 from dotenv import load_dotenv
 
 sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
 load_dotenv()
 
@@ -16,26 +17,37 @@ from langchain_core.messages import HumanMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_openai import ChatOpenAI
 
+from agents_runtime.cli import parse_runtime_args, runtime_session
+from agents_runtime.resilience import resilient
 from schema import AnswerQuestion, ReviseAnswer
 
-llm = ChatOpenAI(model="gpt-4o")
+# max_retries=0 : les retries (avec jitter), timeouts et requêtes hedgées
+# sont gérés par node dans agents_runtime/resilience.py
+llm = ChatOpenAI(model="gpt-4o", stream_usage=True, max_retries=0)
+draft_llm = resilient("draft", llm)
+revise_llm = resilient("revise", llm)
 parser = JsonOutputToolsParser(return_id=True)
 parser_pydantic = PydanticToolsParser(tools=[AnswerQuestion])
 
+# prompt cache : le préfixe (tool schema, instructions, puis l'historique qui ne fait
+# que s'allonger) est identique d'un appel à l'autre. L'heure, qui change à chaque
+# appel, vient en dernier : en tête, elle invaliderait tout le prompt
 actor_prompt_template = ChatPromptTemplate.from_messages(
     [
         (
             "system",
             """ You are expert researcher,
-            current time: {time} 
             1. {first_instruction}
             2. reflect and critique your answer, be severe to maximize improvement
             3. recommend search queries to research information and improve your answer
             """
         ),
         MessagesPlaceholder(variable_name="messages"),
-        ("system", "Answer the user's question above using the required format."),
-    
+        (
+            "system",
+            "Answer the user's question above using the required format.\n"
+            "current time: {time}",
+        ),
     ]
 ).partial(time=lambda: datetime.now().isoformat())
 
@@ -75,23 +87,25 @@ IMPORTANT:
 
 revisor = actor_prompt_template.partial(
     first_instruction=revise_instructions
-) | llm.bind_tools(tools=[ReviseAnswer], tool_choice="ReviseAnswer")
+) | revise_llm.bind_tools(tools=[ReviseAnswer], tool_choice="ReviseAnswer")
 
 
-first_responder = first_responder_prompt_template | llm.bind_tools(
+first_responder = first_responder_prompt_template | draft_llm.bind_tools(
     tools=[AnswerQuestion], tool_choice="AnswerQuestion"
 )
 
 
 if __name__ == "__main__":
+    args = parse_runtime_args("Reflexion first responder chain")
     human_message = HumanMessage(
         content="Talk me about GEO (Generative Engine Optimization) and how it's different from classic SEO, what are the best startup now working on GEO and what are the exceptations on this technology for the future ?"
     )
     chain = (
         first_responder_prompt_template
-        | llm.bind_tools(tools=[AnswerQuestion], tool_choice="AnswerQuestion")
+        | draft_llm.bind_tools(tools=[AnswerQuestion], tool_choice="AnswerQuestion")
         | parser_pydantic
     )
 
-    res = chain.invoke(input={"messages": [human_message]})
+    with runtime_session(args, "reflexion-chains") as config:
+        res = chain.invoke(input={"messages": [human_message]}, config=config)
     print(res)
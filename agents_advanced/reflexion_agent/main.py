@@ -1,25 +1,90 @@
-from typing import List
+import asyncio
+import sys
+from pathlib import Path
 
-from langchain_core.messages import BaseMessage, ToolMessage
-from langgraph.graph import END, MessageGraph
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
+from langchain_core.messages import HumanMessage, ToolMessage
+from langgraph.config import get_stream_writer
+from langgraph.graph import END, StateGraph
+
+from agents_runtime.budget import BudgetLimits, format_usage, usage_from_message
+from agents_runtime.cli import parse_runtime_args, runtime_session
 from chains import revisor, first_responder
-from tool_executor import execute_tools
+from state import ReflexionState
+from streaming import astream_tool_call
+from tool_executor import (
+    cancel_prefetched_searches,
+    execute_tools,
+    prefetch_search,
+    suppress_duplicates,
+)
 
 MAX_ITERATIONS = 2
-builder = MessageGraph()
-builder.add_node("draft", first_responder)
-builder.add_node("execute_tools", execute_tools)
-builder.add_node("revise", revisor)
+BUDGET_LIMITS = BudgetLimits.from_env(max_total_tokens=30_000, max_search_calls=9)
+
+
+def count_tool_visits(state: ReflexionState) -> int:
+    return sum(isinstance(item, ToolMessage) for item in state["messages"])
+
+
+async def astream_answer(chain, state: ReflexionState, prefetch: bool = True):
+    """
+    Streams the answer to the "custom" stream and, when `prefetch` is set,
+    starts each search as soon as its query is complete.
+    """
+    writer = get_stream_writer()
+
+    def on_query(query: str) -> None:
+        if prefetch:
+            writer({"search_query": query})
+            prefetch_search(query)
+
+    return await astream_tool_call(
+        chain,
+        {"messages": state["messages"]},
+        on_answer=lambda delta: writer({"answer_delta": delta}),
+        on_query=on_query,
+    )
+
+
+async def draft_node(state: ReflexionState) -> dict:
+    res = await astream_answer(first_responder, state)
+    return {"messages": [res], "budget": usage_from_message(res)}
+
+
+async def execute_tools_node(state: ReflexionState) -> dict:
+    tool_calls = state["messages"][-1].tool_calls
+    searches = sum(len(call["args"].get("search_queries", [])) for call in tool_calls)
+    output = await execute_tools.ainvoke(state)
+    # results already read in a previous pass never reach the revisor again
+    messages, dedup = suppress_duplicates(state["messages"], output["messages"])
+    return {"messages": messages, "budget": {"search_calls": searches}, "dedup": dedup}
+
+
+async def revise_node(state: ReflexionState) -> dict:
+    # the last revision will not be searched, see event_loop
+    res = await astream_answer(revisor, state, prefetch=count_tool_visits(state) <= MAX_ITERATIONS)
+    return {"messages": [res], "budget": usage_from_message(res)}
+
+
+builder = StateGraph(ReflexionState)
+builder.add_node("draft", draft_node)
+builder.add_node("execute_tools", execute_tools_node)
+builder.add_node("revise", revise_node)
 builder.add_edge("draft", "execute_tools")
 builder.add_edge("execute_tools", "revise")
 
 
-def event_loop(state: List[BaseMessage]) -> str:
-    count_tool_visits = sum(isinstance(item, ToolMessage) for item in state)
-    num_iterations = count_tool_visits
+def event_loop(state: ReflexionState) -> str:
+    num_iterations = count_tool_visits(state)
     if num_iterations > MAX_ITERATIONS:
         return END
+    if reached := BUDGET_LIMITS.exceeded(state.get("budget")):
+        # the last message is the latest revision: the best answer so far
+        print(f"Budget reached ({', '.join(reached)}), stopping with the latest revision")
+        return END
     return "execute_tools"
 
 
@@ -27,11 +92,41 @@ builder.add_conditional_edges("revise", event_loop)
 builder.set_entry_point("draft")
 graph = builder.compile()
 
-print(graph.get_graph().draw_mermaid())
 
+async def run(question: str, config) -> ReflexionState:
+    """Runs the graph, printing each answer while it is generated."""
+    inputs = {"messages": [HumanMessage(content=question)], "user_question": question}
+    final_state = None
+    async for mode, chunk in graph.astream(
+        inputs, config=config, stream_mode=["custom", "updates", "values"]
+    ):
+        if mode == "custom" and "answer_delta" in chunk:
+            print(chunk["answer_delta"], end="", flush=True)
+        elif mode == "custom":
+            print(f"\n-> searching: {chunk['search_query']}", flush=True)
+        elif mode == "updates":
+            print(f"\n[{', '.join(chunk)} done]", flush=True)
+        else:
+            final_state = chunk
+    # the budget may have stopped the loop after a revision was prefetched
+    cancel_prefetched_searches()
+    return final_state
 
-res = graph.invoke(
-    "Talk me about GEO (Generative Engine Optimization) and how it's different from classic SEO, what are the best startup now working on GEO and what are the exceptations on this technology for the future ?"
-)
-print(res[-1].tool_calls[0]["args"]["answer"])
-print(res)
\ No newline at end of file
+
+if __name__ == "__main__":
+    args = parse_runtime_args("Reflexion agent")
+    print(graph.get_graph().draw_mermaid())
+
+    question = "Talk me about GEO (Generative Engine Optimization) and how it's different from classic SEO, what are the best startup now working on GEO and what are the exceptations on this technology for the future ?"
+    with runtime_session(args, "reflexion") as config:
+        res = asyncio.run(run(question, config))
+    print("\n" + "=" * 50)
+    print(res["messages"][-1].tool_calls[0]["args"]["answer"])
+    print(f"Budget: {format_usage(res['budget'], BUDGET_LIMITS)}")
+    dedup = res["dedup"]
+    print(
+        f"Dedup: {dedup.get('results_dropped', 0)} dropped, "
+        f"{dedup.get('results_collapsed', 0)} collapsed, "
+        f"{dedup.get('bytes_saved', 0)} bytes / {dedup.get('tokens_saved', 0)} tokens saved"
+    )
+    print(res)
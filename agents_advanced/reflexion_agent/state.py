@@ -4,10 +4,17 @@ State definition for the Reflexion Agent.
 The Reflexion Agent learns from its mistakes by storing lessons in memory
 and using them to improve subsequent attempts.
 """
+import sys
+from pathlib import Path
 from typing import TypedDict, Annotated, List
 from langchain_core.messages import BaseMessage
 from langgraph.graph.message import add_messages
 
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from agents_runtime.budget import BudgetUsage, add_usage
+from agents_runtime.dedup import DedupStats, add_stats
 from schema import AnswerQuestion, ReviseAnswer
 
 
@@ -22,6 +29,8 @@ class ReflexionState(TypedDict):
     - The reflection memory (lessons learned from previous attempts)
     - Attempt count and success status
     - Search results from executed queries
+    - Tokens and search calls consumed by the run
+    - What duplicate search results suppression saved
     """
     
     # Messages (conversation history) - accumulates with add_messages
@@ -45,3 +54,9 @@ class ReflexionState(TypedDict):
     # Search results from executed queries
     search_results: List[dict] | None
 
+    # Tokens and search calls consumed so far - summed with add_usage
+    budget: Annotated[BudgetUsage, add_usage]
+
+    # Search results dropped or collapsed as duplicates, and the bytes/tokens saved
+    dedup: Annotated[DedupStats, add_stats]
+
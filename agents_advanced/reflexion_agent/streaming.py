@@ -0,0 +1,65 @@
+"""
+Incremental parsing of the forced tool calls (AnswerQuestion / ReviseAnswer).
+
+`first_responder` and `revisor` only return their answer once the whole tool
+call is generated. Here the partial JSON arguments are parsed on every chunk:
+the `answer` text is emitted while it grows, and each search query is handed
+over as soon as it is complete, so the searches run during the generation.
+"""
+
+from collections.abc import Callable
+from typing import Any
+
+from langchain_core.messages import AIMessage, AIMessageChunk, message_chunk_to_message
+from langchain_core.runnables import Runnable, RunnableConfig
+
+
+def complete_queries(args: dict[str, Any]) -> list[str]:
+    """
+    Search queries of partially parsed arguments that can no longer change.
+
+    The last query is still being generated unless a later key (e.g.
+    `references`) has started.
+    """
+    queries = args.get("search_queries")
+    if not isinstance(queries, list):
+        return []
+    keys = list(args)
+    if keys.index("search_queries") < len(keys) - 1:
+        return queries
+    return queries[:-1]
+
+
+async def astream_tool_call(
+    chain: Runnable,
+    inputs: dict[str, Any],
+    on_answer: Callable[[str], None],
+    on_query: Callable[[str], None],
+    config: RunnableConfig | None = None,
+) -> AIMessage:
+    """Streams `chain` and returns the complete AI message, as `chain.invoke` would."""
+    message: AIMessageChunk | None = None
+    answer_length = 0
+    dispatched = 0
+
+    async for chunk in chain.astream(inputs, config):
+        message = chunk if message is None else message + chunk
+        if not message.tool_calls:
+            continue
+        args = message.tool_calls[0]["args"]
+
+        answer = args.get("answer")
+        if isinstance(answer, str) and len(answer) > answer_length:
+            on_answer(answer[answer_length:])
+            answer_length = len(answer)
+
+        for query in complete_queries(args)[dispatched:]:
+            on_query(query)
+            dispatched += 1
+
+    # the stream is over: the last query is complete as well
+    if message.tool_calls:
+        for query in message.tool_calls[0]["args"].get("search_queries", [])[dispatched:]:
+            on_query(query)
+
+    return message_chunk_to_message(message)
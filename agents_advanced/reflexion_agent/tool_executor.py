@@ -1,28 +1,176 @@
+import asyncio
+import json
+from collections import Counter
+
 from dotenv import load_dotenv
 import sys
 from pathlib import Path
 
 load_dotenv()
 sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
 
 from langchain_tavily import TavilySearch
+from langchain_core.messages import BaseMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
 from langchain_core.tools import StructuredTool
 from langgraph.prebuilt import ToolNode
+
+from agents_runtime.dedup import DedupStats, NearDuplicateIndex, count_tokens
+from agents_runtime.resilience import ahedged
 from schema import AnswerQuestion, ReviseAnswer
 
 tavily_tool = TavilySearch(max_results=5)
 
+# searches started while the tool call was still streaming, by query
+prefetched_searches: dict[str, asyncio.Task] = {}
+
+
+def prefetch_search(query: str) -> None:
+    """ start the search now, arun_queries will pick up its result"""
+    if query not in prefetched_searches:
+        prefetched_searches[query] = asyncio.ensure_future(asearch(query))
+
+
+def cancel_prefetched_searches() -> None:
+    """ drop the prefetched searches nobody will use"""
+    for search in prefetched_searches.values():
+        search.cancel()
+    prefetched_searches.clear()
+
+
+async def _tavily(query: str):
+    result = await tavily_tool.ainvoke({"query": query})
+    # TavilySearch returns its errors as {"error": e}: raised again, so that the
+    # error does not win the race and the transient ones are retried
+    if isinstance(result, dict) and "error" in result:
+        error = result["error"]
+        raise error if isinstance(error, Exception) else RuntimeError(error)
+    return result
+
+
+async def asearch(query: str):
+    """ one Tavily search, with the timeout / hedging / retries of the "search" node"""
+    try:
+        # the Tavily client takes no timeout: the search task is cancelled when it runs out
+        return await ahedged("search", lambda _timeout: _tavily(query))
+    except Exception as e:
+        # a failed search still answers, as TavilySearch does, instead of failing the tool call
+        return {"error": repr(e)}
+
+
+def search(query: str):
+    """ sync asearch: a thread could not abandon a slow search, a task is cancelled"""
+    return asyncio.run(asearch(query))
+
+
 def run_queries(search_queries: list[str], **kwargs):
     """ run the generated queries"""
-    return tavily_tool.batch([{"query": query} for query in search_queries])
+    return RunnableLambda(search).batch(search_queries)
+
+
+async def arun_queries(search_queries: list[str], **_kwargs):
+    """ run the generated queries, reusing the prefetched ones"""
+    searches = [
+        prefetched_searches.pop(query, None)
+        or asyncio.ensure_future(asearch(query))
+        for query in search_queries
+    ]
+    # prefetched queries that did not make it into the final tool call
+    cancel_prefetched_searches()
+    return list(await asyncio.gather(*searches))
+
 
 execute_tools = ToolNode(
     [
-        StructuredTool.from_function(run_queries, name=AnswerQuestion.__name__),
-        StructuredTool.from_function(run_queries, name=ReviseAnswer.__name__),
+        StructuredTool.from_function(
+            run_queries, coroutine=arun_queries, name=AnswerQuestion.__name__
+        ),
+        StructuredTool.from_function(
+            run_queries, coroutine=arun_queries, name=ReviseAnswer.__name__
+        ),
     ]
 )
 
 
+def _decode(message: ToolMessage) -> list | None:
+    """ the JSON list a search tool message holds, None for anything else
+    (tool error, or content blocks: ToolNode keeps a list as is, e.g. [] when
+    the model asked for no search)"""
+    if not isinstance(message.content, str):
+        return None
+    try:
+        payloads = json.loads(message.content)
+    except json.JSONDecodeError:
+        return None
+    return payloads if isinstance(payloads, list) else None
+
+
+def _load_payloads(message: ToolMessage) -> list:
+    """ the Tavily payloads of a tool message, [] for a tool error"""
+    return [
+        payload
+        for payload in _decode(message) or []
+        if isinstance(payload, dict) and "results" in payload
+    ]
+
+
+def suppress_duplicates(
+    history: list[BaseMessage], tool_messages: list[ToolMessage]
+) -> tuple[list[ToolMessage], DedupStats]:
+    """
+    Removes from the new search results what the revisor has already read.
+
+    A result whose URL was returned by a previous pass (or earlier in this one)
+    is dropped. A result whose content is a near-duplicate of a known one is
+    collapsed to its url/title and a `duplicate_of` pointer.
+    """
+    index = NearDuplicateIndex()
+    seen_urls = set()
+    for message in history:
+        if isinstance(message, ToolMessage):
+            for payload in _load_payloads(message):
+                for result in payload["results"]:
+                    seen_urls.add(result["url"])
+                    if "content" in result:
+                        index.add(result["url"], result["content"])
+
+    stats = Counter()
+    deduplicated = []
+    for message in tool_messages:
+        payloads = _decode(message)
+        if not payloads:  # tool error, or no query
+            deduplicated.append(message)
+            continue
+
+        for payload in payloads:
+            if not isinstance(payload, dict) or "results" not in payload:
+                continue
+            kept = []
+            for result in payload["results"]:
+                if result["url"] in seen_urls:
+                    stats["results_dropped"] += 1
+                    continue
+                seen_urls.add(result["url"])
+                duplicate_of = index.add(result["url"], result.get("content", ""))
+                if duplicate_of:
+                    stats["results_collapsed"] += 1
+                    kept.append(
+                        {
+                            "url": result["url"],
+                            "title": result.get("title", ""),
+                            "duplicate_of": duplicate_of,
+                        }
+                    )
+                else:
+                    stats["results_kept"] += 1
+                    kept.append(result)
+            payload["results"] = kept
+
+        content = json.dumps(payloads, ensure_ascii=False)
+        stats["bytes_saved"] += len(message.content.encode()) - len(content.encode())
+        stats["tokens_saved"] += count_tokens(message.content) - count_tokens(content)
+        deduplicated.append(message.model_copy(update={"content": content}))
 
+    return deduplicated, dict(stats)
@@ -0,0 +1,124 @@
+"""
+Model calls and latency of the legacy string-wrapped router vs the supervisor.
+
+    python agents_basics/benchmark.py
+    python agents_basics/benchmark.py --record cassettes/router_benchmark.json
+    python agents_basics/benchmark.py --replay cassettes/router_benchmark.json
+
+Each task runs on both graphs. Only the calls reaching the OpenAI API are
+counted (a cascade counts as its fast call, plus the strong one on escalation).
+
+A task is a conversation: its turns run one after the other on the same
+history. The follow-up turn asks about the code a sub-agent ran: the supervisor
+has it in its state, the legacy router only has the sub-agent's final string
+and has to ask again.
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from dotenv import load_dotenv
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_openai import ChatOpenAI
+from main import build_legacy_router, build_router_llm
+from supervisor import build_supervisor
+from tabulate import tabulate
+
+from agents_runtime.cli import parse_runtime_args, runtime_session
+
+load_dotenv()
+
+QR_CODE_TASK = "génère un qr code qui envoie sur la page https://www.linkedin.com/in/yacin-christian-baltagi/ et sauvegarde l'image dans le répertoire courant"
+
+TASKS = {
+    "qr code": [QR_CODE_TASK],
+    "csv": ["Quel est le type de projet qui revient le plus souvent ?"],
+    "csv + qr code": [
+        "Trouve le type de projet qui revient le plus souvent dans le CSV, puis génère un qr code contenant ce type et sauvegarde l'image dans le répertoire courant"
+    ],
+    "qr code + follow-up": [
+        QR_CODE_TASK,
+        "Quel code python_repl a exécuté pour le qr code, et qu'a-t-il affiché ?",
+    ],
+}
+
+
+class ModelCallCounter(BaseCallbackHandler):
+    """Counts the ChatOpenAI calls of a run and their tokens."""
+
+    def __init__(self) -> None:
+        self.runs = set()
+        self.tokens = 0
+
+    @property
+    def calls(self) -> int:
+        return len(self.runs)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:  # noqa: ARG002
+        if (serialized or {}).get("id", [""])[-1] == ChatOpenAI.__name__:
+            self.runs.add(run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:  # noqa: ARG002
+        if run_id not in self.runs:
+            return
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(generation.message, "usage_metadata", None) or {}
+                self.tokens += usage.get("total_tokens", 0)
+
+
+async def measure(graph, turns, config) -> list:
+    counter = ModelCallCounter()
+    config = {**config, "callbacks": [*config["callbacks"], counter]}
+    messages = []
+    started = time.perf_counter()
+    for turn in turns:
+        result = await graph.ainvoke({"messages": [*messages, ("human", turn)]}, config=config)
+        messages = result["messages"]
+    return [counter.calls, counter.tokens, f"{time.perf_counter() - started:.1f}"]
+
+
+async def benchmark(config) -> list:
+    llm = ChatOpenAI(temperature=0, model="gpt-4o")
+    legacy = build_legacy_router(llm)
+    supervisor = build_supervisor(router_llm=build_router_llm(), agents_llm=llm)
+
+    rows = []
+    # séquentiel : les deux graphes ne doivent pas se disputer le rate limit
+    for name, turns in TASKS.items():
+        print(f"⏱️  {name}...")
+        rows.append(
+            [
+                name,
+                *await measure(legacy, turns, config),
+                *await measure(supervisor, turns, config),
+            ]
+        )
+    return rows
+
+
+if __name__ == "__main__":
+    args = parse_runtime_args("Legacy router vs supervisor benchmark")
+    with runtime_session(args, "router_benchmark") as config:
+        rows = asyncio.run(benchmark(config))
+
+    print("\n📊 ROUTER BENCHMARK")
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "task",
+                "legacy calls",
+                "legacy tokens",
+                "legacy (s)",
+                "supervisor calls",
+                "supervisor tokens",
+                "supervisor (s)",
+            ],
+        )
+    )
@@ -1,51 +1,44 @@
+import asyncio
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
 from dotenv import load_dotenv
 from langchain_classic.agents import AgentExecutor
 from langchain_openai import ChatOpenAI
-from langchain_experimental.tools import PythonREPLTool
-from langchain_experimental.agents import create_csv_agent
 from langchain_core.tools import Tool
 from langgraph.prebuilt import create_react_agent
 
+from agents_runtime.cascade import node_cascade
+from agents_runtime.cli import parse_runtime_args, runtime_session
+from subagents import build_csv_agent, build_python_agent
+from supervisor import build_supervisor
+
 load_dotenv()
 
 SCRIPT_DIR = Path(__file__).parent
 
 
-def main():
-    print("start...")
+def build_router_llm():
+    # routing is an easy decision: gpt-4o-mini first, gpt-4o only when the
+    # mini model produces malformed tool calls
+    return node_cascade(
+        "route",
+        validate=lambda message: not message.invalid_tool_calls
+        and bool(message.tool_calls or message.content),
+        temperature=0,
+    )
 
-    llm = ChatOpenAI(temperature=0, model="gpt-4o")
 
-    # agent python
-    python_agent_instructions = """You are a Python code execution agent. 
-    IMPORTANT: You MUST use the python_repl tool to execute code. Never just describe code - EXECUTE it.
-    
-    You have access to:
-    - qrcode package for generating QR codes
-    - All standard Python libraries
-    
-    Rules:
-    1. ALWAYS execute code using the python_repl tool
-    2. If you get an error, debug and retry
-    3. After execution, report what was done based on the actual output
-    4. Files are saved in the current working directory
+def build_legacy_router(llm):
     """
-
-    python_agent_executor = create_react_agent(
-        model=llm,
-        tools=[PythonREPLTool()],
-        prompt=python_agent_instructions,
-    )
-
-    # agent csv
-    csv_agent_executor = create_csv_agent(
-        llm=llm,
-        path=str(SCRIPT_DIR / "projets_lpb.csv"),
-        verbose=True,
-        allow_dangerous_code=True,
-    )
+    First version of the router: the sub-agents are tools returning a string.
+    Kept as the baseline of benchmark.py.
+    """
+    python_agent_executor = build_python_agent(llm)
+    csv_agent_executor = build_csv_agent(llm)
 
     # agent rooter
     def run_python_agent(query: str) -> str:
@@ -58,17 +51,29 @@ def main():
         result = csv_agent_executor.invoke({"input": query})
         return result["output"]
 
+    # versions async : le ToolNode du router lance en parallèle (asyncio.gather)
+    # les tool calls d'un même tour, la latence est celle du sous-agent le plus lent
+    async def arun_python_agent(query: str) -> str:
+        result = await python_agent_executor.ainvoke({"messages": [("human", query)]})
+        return result["messages"][-1].content
+
+    async def arun_csv_agent(query: str) -> str:
+        result = await csv_agent_executor.ainvoke({"input": query})
+        return result["output"]
+
     # the description of each tool is very important
     # without that, the rooter agent will not now which tool use
     router_tools = [
         Tool(
             name="python_agent",
             func=run_python_agent,
+            coroutine=arun_python_agent,
             description="Useful when you need to transform natural language to python and execute python code, returning the results of the code execution. DOES NOT ACCEPT CODE AS INPUT.",
         ),
         Tool(
             name="csv_agent",
             func=run_csv_agent,
+            coroutine=arun_csv_agent,
             description="Useful when you need to answer questions over the CSV file 'projets_lpb.csv'. Takes the entire question as input and returns the answer after running pandas calculations.",
         ),
     ]
@@ -79,25 +84,44 @@ def main():
     - csv_agent: for analyzing CSV data
     
     Choose the right agent based on the user's question.
+
+    When the request needs both agents:
+    - if the tasks are independent, call both agents in the SAME turn, they run in parallel
+    - if one task needs the result of the other, call the first agent, wait for its
+      answer, then call the second one with that result in its input
     """
 
-    router_agent = create_react_agent(
-        model=llm,
+    return create_react_agent(
+        model=build_router_llm(),
         tools=router_tools,
         prompt=router_instructions,
     )
 
-    result = router_agent.invoke(
-        {
-            "messages": [
-                (
-                    "human",
-                    "génère 2 qr codes qui envoie sur la page https://www.linkedin.com/in/yacin-christian-baltagi/, tu as accès à la bibliotheque python qr code, sauvegarde les images dans le répertoire courant",
-                )
-            ]
-            # "Quel est le type de projet qui revient le plus souvent ?"
-        }
-    )
+
+def main():
+    args = parse_runtime_args("Hierarchical router agent")
+    print("start...")
+
+    llm = ChatOpenAI(temperature=0, model="gpt-4o")
+
+    # supervisor LangGraph : les sous-agents sont des subgraphs qui partagent le state
+    router_agent = build_supervisor(router_llm=build_router_llm(), agents_llm=llm)
+
+    with runtime_session(args, "router") as config:
+        result = asyncio.run(
+            router_agent.ainvoke(
+                {
+                    "messages": [
+                        (
+                            "human",
+                            "génère 2 qr codes qui envoie sur la page https://www.linkedin.com/in/yacin-christian-baltagi/, tu as accès à la bibliotheque python qr code, sauvegarde les images dans le répertoire courant",
+                        )
+                    ]
+                    # "Quel est le type de projet qui revient le plus souvent ?"
+                },
+                config=config,
+            )
+        )
 
     print("\n" + "=" * 50)
     print("FINAL RESPONSE:")
@@ -0,0 +1,97 @@
+import threading
+from pathlib import Path
+
+import pandas as pd
+from langchain_experimental.agents import create_csv_agent
+from langchain_experimental.tools import PythonAstREPLTool, PythonREPLTool
+from langgraph.prebuilt import create_react_agent
+
+SCRIPT_DIR = Path(__file__).parent
+CSV_PATH = SCRIPT_DIR / "projets_lpb.csv"
+
+PYTHON_AGENT = "python_agent"
+CSV_AGENT = "csv_agent"
+
+# les REPL remplacent sys.stdout (global au process) pendant l'exécution : deux
+# sous-agents lancés en parallèle mélangeraient leurs sorties. Seuls les appels
+# LLM se chevauchent, le code Python s'exécute un bloc à la fois.
+REPL_LOCK = threading.Lock()
+
+# agent python
+python_agent_instructions = """You are a Python code execution agent.
+IMPORTANT: You MUST use the python_repl tool to execute code. Never just describe code - EXECUTE it.
+
+You have access to:
+- qrcode package for generating QR codes
+- All standard Python libraries
+
+Rules:
+1. ALWAYS execute code using the python_repl tool
+2. If you get an error, debug and retry
+3. After execution, report what was done based on the actual output
+4. Files are saved in the current working directory
+"""
+
+# agent csv (LangGraph version of create_csv_agent: same pandas REPL on `df`)
+csv_agent_instructions = """You are working with a pandas dataframe in Python. The name of the dataframe is `df`.
+It is loaded from the CSV file '{file_name}'. You MUST use the python_repl_ast tool to run
+pandas code on `df`, and answer from the actual output.
+
+This is the result of `print(df.head())`:
+{head}
+"""
+
+
+class LockedPythonREPLTool(PythonREPLTool):
+    """PythonREPLTool holding REPL_LOCK while it runs (`_arun` runs `run` in a thread)."""
+
+    def _run(self, query, run_manager=None):
+        with REPL_LOCK:
+            return super()._run(query, run_manager)
+
+
+class LockedPythonAstREPLTool(PythonAstREPLTool):
+    """PythonAstREPLTool holding REPL_LOCK while it runs (`_arun` runs `_run` in a thread)."""
+
+    def _run(self, query, run_manager=None):
+        with REPL_LOCK:
+            return super()._run(query, run_manager)
+
+
+def build_python_agent(llm):
+    """ReAct agent executing Python code, as a compiled LangGraph subgraph."""
+    return create_react_agent(
+        model=llm,
+        tools=[LockedPythonREPLTool()],
+        prompt=python_agent_instructions,
+        name=PYTHON_AGENT,
+    )
+
+
+def build_csv_agent(llm):
+    """Classic AgentExecutor over the CSV file (string in, string out)."""
+    executor = create_csv_agent(
+        llm=llm,
+        path=str(CSV_PATH),
+        verbose=True,
+        allow_dangerous_code=True,
+    )
+    # create_csv_agent construit son propre PythonAstREPLTool : même `df`, mais verrouillé
+    executor.tools = [
+        LockedPythonAstREPLTool(locals=tool.locals, globals=tool.globals)
+        if isinstance(tool, PythonAstREPLTool)
+        else tool
+        for tool in executor.tools
+    ]
+    return executor
+
+
+def build_csv_subgraph(llm):
+    """ReAct agent running pandas on the CSV file, as a compiled LangGraph subgraph."""
+    df = pd.read_csv(CSV_PATH)
+    return create_react_agent(
+        model=llm,
+        tools=[LockedPythonAstREPLTool(locals={"df": df})],
+        prompt=csv_agent_instructions.format(file_name=CSV_PATH.name, head=df.head().to_markdown()),
+        name=CSV_AGENT,
+    )
@@ -0,0 +1,113 @@
+"""
+Hierarchical router rebuilt as a LangGraph supervisor.
+
+The python and CSV agents are compiled subgraphs added as nodes of the
+supervisor graph, and they share its `messages` state. Their tool calls and
+outputs (file names, computed values) land in that state instead of being
+flattened into a single string, so the supervisor sees them and does not have
+to ask again.
+
+Independent delegations of one round are sent in parallel (Send). A task that
+needs another task's result is delegated in a later round.
+"""
+
+from typing import Annotated, Literal, TypedDict
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+from langgraph.types import Command, Send
+from pydantic import BaseModel, Field
+from subagents import (
+    CSV_AGENT,
+    PYTHON_AGENT,
+    build_csv_subgraph,
+    build_python_agent,
+)
+
+SUPERVISOR = "supervisor"
+MAX_ROUNDS = 3
+
+supervisor_instructions = f"""You are a supervisor agent that delegates tasks to specialized agents.
+You have access to:
+- {PYTHON_AGENT}: transforms natural language to python and executes it (QR codes, files, computations)
+- {CSV_AGENT}: answers questions over the CSV file 'projets_lpb.csv' with pandas
+
+The conversation contains everything the agents already did (their code, tool outputs, files).
+Reuse it: never delegate again something that is already answered there.
+
+Each round, either:
+- delegate the tasks that can be done now. Independent tasks are delegated together and run in
+  parallel. A task that needs the result of another one waits for the next round, and its
+  instruction includes that result.
+- or, when the user's request is fully handled, give no delegation and write the final answer.
+"""
+
+
+class Delegation(BaseModel):
+    agent: Literal["python_agent", "csv_agent"] = Field(description="agent to run")
+    task: str = Field(description="self-contained instruction for the agent")
+
+
+class Route(BaseModel):
+    """Next step of the supervisor."""
+
+    delegations: list[Delegation] = Field(
+        default=[], description="tasks to run now, in parallel; empty when the request is handled"
+    )
+    final_answer: str = Field(
+        default="", description="answer to the user, when there is no delegation"
+    )
+
+
+class SupervisorState(TypedDict):
+    # shared with the sub-agents' subgraphs
+    messages: Annotated[list[BaseMessage], add_messages]
+
+    # delegation rounds done so far
+    rounds: int
+
+
+def build_supervisor(router_llm, agents_llm):
+    """Compiles the supervisor graph. `router_llm` routes, `agents_llm` runs the sub-agents."""
+    router = router_llm.with_structured_output(Route)
+
+    async def supervisor_node(state: SupervisorState) -> Command:
+        rounds = state.get("rounds", 0)
+        messages = [SystemMessage(content=supervisor_instructions), *state["messages"]]
+        if rounds >= MAX_ROUNDS:
+            messages.append(
+                SystemMessage(content="No more delegation: write the final answer from the above.")
+            )
+        route = await router.ainvoke(messages)
+
+        if not route.delegations or rounds >= MAX_ROUNDS:
+            return Command(
+                update={"messages": [AIMessage(content=route.final_answer, name=SUPERVISOR)]},
+                goto=END,
+            )
+
+        return Command(
+            update={"rounds": rounds + 1},
+            goto=[
+                Send(
+                    delegation.agent,
+                    {
+                        "messages": [
+                            *state["messages"],
+                            HumanMessage(content=delegation.task, name=SUPERVISOR),
+                        ]
+                    },
+                )
+                for delegation in route.delegations
+            ],
+        )
+
+    builder = StateGraph(SupervisorState)
+    builder.add_node(SUPERVISOR, supervisor_node, destinations=(PYTHON_AGENT, CSV_AGENT, END))
+    builder.add_node(PYTHON_AGENT, build_python_agent(agents_llm))
+    builder.add_node(CSV_AGENT, build_csv_subgraph(agents_llm))
+    builder.add_edge(START, SUPERVISOR)
+    builder.add_edge(PYTHON_AGENT, SUPERVISOR)
+    builder.add_edge(CSV_AGENT, SUPERVISOR)
+    return builder.compile()
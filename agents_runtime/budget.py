@@ -0,0 +1,98 @@
+"""
+Per-run token and search budget for looping agents.
+
+The loops of the research, reflection and reflexion graphs are only bounded by
+iteration counters. Each node reports what it consumed as a partial `BudgetUsage`,
+the `add_usage` reducer sums it into the graph state, and the routing functions
+ask `BudgetLimits.exceeded()` whether the run must stop at END.
+"""
+
+import os
+from typing import TypedDict
+
+from langchain_core.messages import BaseMessage
+from pydantic import BaseModel, Field
+
+USAGE_KEYS = ("prompt_tokens", "completion_tokens", "search_calls")
+
+
+class BudgetUsage(TypedDict, total=False):
+    """What a run (or a single node) has consumed so far."""
+
+    prompt_tokens: int
+    completion_tokens: int
+    search_calls: int
+
+
+def add_usage(left: BudgetUsage | None, right: BudgetUsage | None) -> BudgetUsage:
+    """State reducer: sums two usages key by key."""
+    left = left or {}
+    right = right or {}
+    return {key: left.get(key, 0) + right.get(key, 0) for key in USAGE_KEYS}
+
+
+def usage_from_message(message: BaseMessage) -> BudgetUsage:
+    """Reads the token usage reported by the provider on an AI message."""
+    metadata = getattr(message, "usage_metadata", None) or {}
+    return {
+        "prompt_tokens": metadata.get("input_tokens", 0),
+        "completion_tokens": metadata.get("output_tokens", 0),
+    }
+
+
+class BudgetLimits(BaseModel):
+    """Limits for one run. `None` means unlimited."""
+
+    max_prompt_tokens: int | None = Field(default=None, description="prompt tokens per run")
+    max_completion_tokens: int | None = Field(default=None, description="completion tokens per run")
+    max_total_tokens: int | None = Field(
+        default=None, description="prompt + completion tokens per run"
+    )
+    max_search_calls: int | None = Field(default=None, description="search calls per run")
+
+    @classmethod
+    def from_env(cls, prefix: str = "AGENT_BUDGET_", **defaults: int | None) -> "BudgetLimits":
+        """
+        Builds the limits from `defaults`, overridden by environment variables
+        such as AGENT_BUDGET_MAX_TOTAL_TOKENS=20000 (0 disables a limit).
+        """
+        values = dict(defaults)
+        for name in cls.model_fields:
+            raw = os.getenv(f"{prefix}{name.upper()}")
+            if raw is not None:
+                values[name] = int(raw) or None
+        return cls(**values)
+
+    def exceeded(self, usage: BudgetUsage | None) -> list[str]:
+        """Returns the limits reached by `usage` (empty list if the run can go on)."""
+        usage = usage or {}
+        consumed = {
+            "max_prompt_tokens": usage.get("prompt_tokens", 0),
+            "max_completion_tokens": usage.get("completion_tokens", 0),
+            "max_total_tokens": usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0),
+            "max_search_calls": usage.get("search_calls", 0),
+        }
+        return [
+            name
+            for name, value in consumed.items()
+            if getattr(self, name) is not None and value >= getattr(self, name)
+        ]
+
+
+def format_usage(usage: BudgetUsage | None, limits: BudgetLimits) -> str:
+    """One line summary, e.g. 'prompt 1200/∞ · completion 300/∞ · total 1500/20000 · search 3/10'."""
+    usage = usage or {}
+
+    def fmt(value: int, limit: int | None) -> str:
+        return f"{value}/{limit if limit is not None else '∞'}"
+
+    prompt = usage.get("prompt_tokens", 0)
+    completion = usage.get("completion_tokens", 0)
+    return " · ".join(
+        [
+            f"prompt {fmt(prompt, limits.max_prompt_tokens)}",
+            f"completion {fmt(completion, limits.max_completion_tokens)}",
+            f"total {fmt(prompt + completion, limits.max_total_tokens)}",
+            f"search {fmt(usage.get('search_calls', 0), limits.max_search_calls)}",
+        ]
+    )
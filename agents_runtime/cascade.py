@@ -0,0 +1,236 @@
+"""
+Per-node model cascade: a fast, cheap model first, the large one only if needed.
+
+`CascadeChatModel` is a chat model, so it drops in wherever a node used a
+ChatOpenAI (prompt | model, create_react_agent, bind_tools). Each call goes to
+the fast model; it escalates to the strong model when
+
+- the fast call fails,
+- the node's `validate` rejects the answer, or
+- the fast model's confidence, its mean token probability from logprobs,
+  is below `min_confidence`.
+
+`cascade_report()` gives the escalation rate and the latency saved per node.
+"""
+
+import math
+import os
+import threading
+import time
+from collections.abc import Callable, Sequence
+from typing import Any
+
+from langchain_core.callbacks import AsyncCallbackManager, CallbackManager
+from langchain_core.callbacks.manager import AsyncRunManager
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.messages.ai import add_usage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_openai import ChatOpenAI
+from tabulate import tabulate
+
+
+class NodeCascadeStats:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.escalations = 0
+        self.fast_seconds = 0.0
+        self.strong_seconds = 0.0
+
+    def record(self, fast_seconds: float, strong_seconds: float | None) -> None:
+        with self.lock:
+            self.calls += 1
+            self.fast_seconds += fast_seconds
+            if strong_seconds is not None:
+                self.escalations += 1
+                self.strong_seconds += strong_seconds
+
+    @property
+    def latency_saved(self) -> float | None:
+        """
+        Seconds saved compared to calling the strong model every time, or None
+        before the first escalation (the strong model latency is unknown).
+        """
+        if not self.escalations:
+            return None
+        mean_strong = self.strong_seconds / self.escalations
+        return self.calls * mean_strong - (self.fast_seconds + self.strong_seconds)
+
+
+# stats by node, shared by the copies bind_tools() makes of a cascade
+CASCADE_STATS: dict[str, NodeCascadeStats] = {}
+
+
+def mean_token_probability(message: AIMessage) -> float | None:
+    """exp(mean logprob) of the generated tokens, None without logprobs (e.g. tool calls)."""
+    logprobs = (message.response_metadata.get("logprobs") or {}).get("content") or []
+    if not logprobs:
+        return None
+    return math.exp(sum(token["logprob"] for token in logprobs) / len(logprobs))
+
+
+def _child_config(run_manager) -> RunnableConfig:
+    """Config nesting the fast/strong model runs under the cascade run."""
+    if run_manager is None:
+        return {}
+    manager_cls = (
+        AsyncCallbackManager if isinstance(run_manager, AsyncRunManager) else CallbackManager
+    )
+    return {
+        "callbacks": manager_cls(
+            handlers=run_manager.inheritable_handlers,
+            inheritable_handlers=run_manager.inheritable_handlers,
+            parent_run_id=run_manager.run_id,
+            tags=run_manager.inheritable_tags,
+            inheritable_tags=run_manager.inheritable_tags,
+            metadata=run_manager.inheritable_metadata,
+            inheritable_metadata=run_manager.inheritable_metadata,
+        )
+    }
+
+
+class CascadeChatModel(BaseChatModel):
+    node: str
+    fast: Runnable
+    strong: Runnable
+    validate_response: Callable[[AIMessage], bool] | None = None
+    min_confidence: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "cascade"
+
+    @property
+    def stats(self) -> NodeCascadeStats:
+        return CASCADE_STATS.setdefault(self.node, NodeCascadeStats())
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "CascadeChatModel":
+        return self.model_copy(
+            update={
+                "fast": self.fast.bind_tools(tools, **kwargs),
+                "strong": self.strong.bind_tools(tools, **kwargs),
+            }
+        )
+
+    def _accept(self, message: AIMessage) -> bool:
+        if self.validate_response is not None and not self.validate_response(message):
+            return False
+        confidence = mean_token_probability(message)
+        return confidence is None or confidence >= self.min_confidence
+
+    def _result(self, fast: AIMessage | None, strong: AIMessage | None) -> ChatResult:
+        message = strong or fast
+        if fast is not None and strong is not None:
+            # the rejected fast call was paid for too
+            usage = add_usage(fast.usage_metadata, strong.usage_metadata)
+            message = strong.model_copy(update={"usage_metadata": usage})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        config = _child_config(run_manager)
+
+        started = time.perf_counter()
+        try:
+            fast = self.fast.invoke(messages, config, stop=stop, **kwargs)
+        except Exception:  # a failing fast model escalates
+            fast = None
+        fast_seconds = time.perf_counter() - started
+        if fast is not None and self._accept(fast):
+            self.stats.record(fast_seconds, None)
+            return self._result(fast, None)
+
+        started = time.perf_counter()
+        strong = self.strong.invoke(messages, config, stop=stop, **kwargs)
+        self.stats.record(fast_seconds, time.perf_counter() - started)
+        return self._result(fast, strong)
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        config = _child_config(run_manager)
+
+        started = time.perf_counter()
+        try:
+            fast = await self.fast.ainvoke(messages, config, stop=stop, **kwargs)
+        except Exception:  # a failing fast model escalates
+            fast = None
+        fast_seconds = time.perf_counter() - started
+        if fast is not None and self._accept(fast):
+            self.stats.record(fast_seconds, None)
+            return self._result(fast, None)
+
+        started = time.perf_counter()
+        strong = await self.strong.ainvoke(messages, config, stop=stop, **kwargs)
+        self.stats.record(fast_seconds, time.perf_counter() - started)
+        return self._result(fast, strong)
+
+
+def node_cascade(
+    node: str,
+    fast_model: str = "gpt-4o-mini",
+    strong_model: str = "gpt-4o",
+    validate: Callable[[AIMessage], bool] | None = None,
+    min_confidence: float = 0.0,
+    **model_kwargs: Any,
+) -> CascadeChatModel:
+    """
+    Cascade for `node`. The models can be overridden per node with the
+    CASCADE_<NODE>_FAST / CASCADE_<NODE>_STRONG environment variables.
+    """
+    prefix = f"CASCADE_{node.upper()}"
+    return CascadeChatModel(
+        node=node,
+        # logprobs give the fast model's confidence
+        fast=ChatOpenAI(
+            model=os.getenv(f"{prefix}_FAST", fast_model), logprobs=True, **model_kwargs
+        ),
+        strong=ChatOpenAI(model=os.getenv(f"{prefix}_STRONG", strong_model), **model_kwargs),
+        validate_response=validate,
+        min_confidence=min_confidence,
+    )
+
+
+def cascade_report() -> str | None:
+    """Table of escalations and latency saved per node, None if no cascade ran."""
+    rows = []
+    for node, stats in CASCADE_STATS.items():
+        if not stats.calls:
+            continue
+        saved = stats.latency_saved
+        rows.append(
+            [
+                node,
+                stats.calls,
+                stats.escalations,
+                f"{100 * stats.escalations / stats.calls:.0f}%",
+                f"{stats.fast_seconds / stats.calls:.2f}",
+                f"{stats.strong_seconds / stats.escalations:.2f}" if stats.escalations else "-",
+                f"{saved:.2f}" if saved is not None else "n/a",
+            ]
+        )
+    if not rows:
+        return None
+    return tabulate(
+        rows,
+        headers=[
+            "node",
+            "calls",
+            "escalations",
+            "rate",
+            "fast (s/call)",
+            "strong (s/call)",
+            "saved (s)",
+        ],
+    )
@@ -0,0 +1,426 @@
+"""
+Record/replay cassettes for ChatOpenAI and TavilySearch calls.
+
+In record mode every model call (plain or streamed, sync or async) and every
+Tavily search goes to the network as usual and is appended to the cassette
+with its latency (per chunk for streams). In replay mode the same calls are
+served from the cassette without network, either with the recorded latencies
+or with none, which makes a run reproducible for performance and correctness
+regression checks.
+
+The cassette also keeps the final output of the recorded run: a replay reports
+whether it reproduced it (see `agents_runtime.regression`).
+
+Interactions are matched on a digest of the request (messages, tools, query).
+Known volatile values (the current time some prompts embed) are normalised
+in the digest. When nothing matches exactly, the first unused interaction of
+the same kind is still served so the run can go on, but the replay reports it
+as a mismatch: the request changed since the recording (e.g. a prompt was
+edited), and the regression run fails.
+"""
+
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Literal
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.load import dumpd
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_openai import ChatOpenAI
+from langchain_tavily import TavilySearch
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+# When set, a replay writes its report (JSON) to this path for the regression runner
+REPORT_ENV = "AGENT_CASSETTE_REPORT"
+
+
+class CassetteMiss(LookupError):
+    """The replayed run made a call the cassette has no recording for."""
+
+
+def _digest(payload: Any) -> str:
+    raw = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+# ISO timestamps, e.g. the `{time}` of the reflexion prompts
+_TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?")
+
+
+def _stable_content(content: str | list) -> str:
+    text = content if isinstance(content, str) else json.dumps(content, sort_keys=True)
+    return _TIMESTAMP.sub("{time}", text)
+
+
+def _chat_key(model: ChatOpenAI, messages: list, stop: list[str] | None, kwargs: dict) -> str:
+    # message ids are random (add_messages), timeouts adaptive (resilience) and
+    # timestamps change every run: they are left out of the key
+    return _digest(
+        {
+            "model": model.model_name,
+            "messages": [
+                {
+                    "type": message.type,
+                    "content": _stable_content(message.content),
+                    "tool_calls": getattr(message, "tool_calls", None),
+                    "tool_call_id": getattr(message, "tool_call_id", None),
+                }
+                for message in messages
+            ],
+            "stop": stop,
+            "kwargs": {name: value for name, value in kwargs.items() if name != "timeout"},
+        }
+    )
+
+
+# left out of the compared final state: random message ids, and token counts
+# that depend on the environment (dedup.count_tokens estimates them offline,
+# when the tiktoken encoding cannot be downloaded)
+UNSTABLE_OUTPUT_KEYS = {"id", "tokens_saved"}
+
+
+def _strip_unstable(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {
+            key: _strip_unstable(item)
+            for key, item in value.items()
+            if key not in UNSTABLE_OUTPUT_KEYS
+        }
+    if isinstance(value, list):
+        return [_strip_unstable(item) for item in value]
+    return value
+
+
+def normalize_output(outputs: Any) -> Any:
+    """JSON form of a run's final state, without its unstable values (UNSTABLE_OUTPUT_KEYS)."""
+    return json.loads(json.dumps(_strip_unstable(dumpd(outputs)), default=str, sort_keys=True))
+
+
+def _dump_result(result: ChatResult) -> dict:
+    return {
+        "generations": [
+            {"message": message_to_dict(gen.message), "generation_info": gen.generation_info}
+            for gen in result.generations
+        ],
+        "llm_output": result.llm_output,
+    }
+
+
+def _load_result(data: dict) -> ChatResult:
+    return ChatResult(
+        generations=[
+            ChatGeneration(
+                message=messages_from_dict([gen["message"]])[0],
+                generation_info=gen["generation_info"],
+            )
+            for gen in data["generations"]
+        ],
+        llm_output=data["llm_output"],
+    )
+
+
+def _dump_chunk(chunk: ChatGenerationChunk) -> dict:
+    return {"message": message_to_dict(chunk.message), "generation_info": chunk.generation_info}
+
+
+def _load_chunk(data: dict) -> ChatGenerationChunk:
+    return ChatGenerationChunk(
+        message=messages_from_dict([data["message"]])[0],
+        generation_info=data["generation_info"],
+    )
+
+
+class _OutputCapture(BaseCallbackHandler):
+    """Keeps the outputs of the root run (the graph's final state)."""
+
+    def __init__(self) -> None:
+        self.outputs = None
+
+    def on_chain_end(self, outputs, *, run_id, parent_run_id=None, **kwargs):  # noqa: ARG002
+        if parent_run_id is None:
+            self.outputs = outputs
+
+
+class Cassette:
+    """
+    Context manager patching ChatOpenAI and TavilySearch for a run:
+
+        with Cassette(path, mode="replay", latency="zero") as cassette:
+            graph.invoke(inputs, config={"callbacks": [cassette.output_capture]})
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        mode: Literal["record", "replay"],
+        latency: Literal["recorded", "zero"] = "recorded",
+    ) -> None:
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        self.output_capture = _OutputCapture()
+        self._lock = threading.Lock()
+        self._patched: list[tuple[type, str, Any]] = []
+
+        if mode == "replay":
+            self.data = json.loads(self.path.read_text())
+            self._used = [False] * len(self.data["interactions"])
+            # calls served without an exact key match, e.g. "chat #3"
+            self._mismatches: list[str] = []
+        else:
+            entry = Path(sys.argv[0]).resolve()
+            self.data = {
+                "version": 2,
+                "entry": str(
+                    entry.relative_to(REPO_ROOT) if entry.is_relative_to(REPO_ROOT) else entry
+                ),
+                "recorded_at": datetime.now().isoformat(timespec="seconds"),
+                "interactions": [],
+            }
+
+    # -- context manager ------------------------------------------------------
+
+    def __enter__(self) -> "Cassette":
+        if self.mode == "replay":
+            # nothing may leave the machine during a replay
+            os.environ["LANGCHAIN_TRACING_V2"] = "false"
+            os.environ["LANGSMITH_TRACING"] = "false"
+        self._patch(ChatOpenAI, "_generate", self._wrap_generate)
+        self._patch(ChatOpenAI, "_agenerate", self._wrap_agenerate)
+        self._patch(ChatOpenAI, "_stream", self._wrap_stream)
+        self._patch(ChatOpenAI, "_astream", self._wrap_astream)
+        self._patch(TavilySearch, "_run", self._wrap_search)
+        self._patch(TavilySearch, "_arun", self._wrap_asearch)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        wall_time = time.perf_counter() - self._started
+        for cls, name, original in reversed(self._patched):
+            if original is None:
+                delattr(cls, name)
+            else:
+                setattr(cls, name, original)
+        self._patched.clear()
+
+        if exc_type is not None:
+            return
+        output = normalize_output(self.output_capture.outputs)
+        if self.mode == "record":
+            self.data["wall_time"] = round(wall_time, 3)
+            self.data["final_output"] = output
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(self.data, indent=1, ensure_ascii=False))
+            print(f"\n📼 Cassette recorded: {self.path} ({len(self.data['interactions'])} calls)")
+        else:
+            report = {
+                "cassette": str(self.path),
+                "entry": self.data["entry"],
+                "wall_time": wall_time,
+                "recorded_wall_time": self.data.get("wall_time"),
+                "output_matches": output == self.data.get("final_output"),
+                "unused_interactions": self._used.count(False),
+                "mismatched_calls": self._mismatches,
+            }
+            if report_path := os.getenv(REPORT_ENV):
+                Path(report_path).write_text(json.dumps(report))
+            status = "output reproduced" if report["output_matches"] else "OUTPUT DIFFERS"
+            print(
+                f"\n📼 Replay {self.path.name}: {status}, {wall_time:.2f}s "
+                f"(recorded {report['recorded_wall_time']}s), "
+                f"{report['unused_interactions']} unused call(s)"
+            )
+            if self._mismatches:
+                print(
+                    f"   ⚠️ {len(self._mismatches)} request(s) changed since the recording: "
+                    + ", ".join(self._mismatches)
+                )
+
+    def _patch(self, cls: type, name: str, make_wrapper) -> None:
+        original = getattr(cls, name)
+        self._patched.append((cls, name, cls.__dict__.get(name)))
+        setattr(cls, name, functools.wraps(original)(make_wrapper(original)))
+
+    # -- storage --------------------------------------------------------------
+
+    def _append(self, interaction: dict) -> None:
+        with self._lock:
+            self.data["interactions"].append(interaction)
+
+    def _take(self, kind: str, key: str) -> dict:
+        with self._lock:
+            candidates = [
+                i
+                for i, interaction in enumerate(self.data["interactions"])
+                if not self._used[i] and interaction["kind"] == kind
+            ]
+            exact = [i for i in candidates if self.data["interactions"][i]["key"] == key]
+            if not (exact or candidates):
+                raise CassetteMiss(f"no recorded {kind} call left in {self.path}")
+            index = (exact or candidates)[0]
+            if not exact:
+                self._mismatches.append(f"{kind} #{index}")
+            self._used[index] = True
+            return self.data["interactions"][index]
+
+    def _delay(self, seconds: float) -> float:
+        return seconds if self.latency == "recorded" else 0.0
+
+    # -- ChatOpenAI -----------------------------------------------------------
+
+    def _wrap_generate(self, original):
+        def _generate(model, messages, stop=None, run_manager=None, **kwargs):
+            key = _chat_key(model, messages, stop, kwargs)
+            if self.mode == "replay":
+                interaction = self._take("chat", key)
+                time.sleep(self._delay(interaction["latency"]))
+                return _load_result(interaction["result"])
+
+            started = time.perf_counter()
+            result = original(model, messages, stop, run_manager, **kwargs)
+            self._append(
+                {
+                    "kind": "chat",
+                    "key": key,
+                    "latency": time.perf_counter() - started,
+                    "result": _dump_result(result),
+                }
+            )
+            return result
+
+        return _generate
+
+    def _wrap_agenerate(self, original):
+        async def _agenerate(model, messages, stop=None, run_manager=None, **kwargs):
+            key = _chat_key(model, messages, stop, kwargs)
+            if self.mode == "replay":
+                interaction = self._take("chat", key)
+                await asyncio.sleep(self._delay(interaction["latency"]))
+                return _load_result(interaction["result"])
+
+            started = time.perf_counter()
+            result = await original(model, messages, stop, run_manager, **kwargs)
+            self._append(
+                {
+                    "kind": "chat",
+                    "key": key,
+                    "latency": time.perf_counter() - started,
+                    "result": _dump_result(result),
+                }
+            )
+            return result
+
+        return _agenerate
+
+    def _wrap_stream(self, original):
+        def _stream(model, messages, stop=None, run_manager=None, **kwargs):
+            key = _chat_key(model, messages, stop, kwargs)
+            if self.mode == "replay":
+                started = time.perf_counter()
+                for item in self._take("chat_stream", key)["chunks"]:
+                    time.sleep(
+                        max(0.0, self._delay(item["offset"]) - (time.perf_counter() - started))
+                    )
+                    chunk = _load_chunk(item["chunk"])
+                    if run_manager:
+                        run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                    yield chunk
+                return
+
+            started = time.perf_counter()
+            chunks = []
+            try:
+                for chunk in original(model, messages, stop, run_manager, **kwargs):
+                    chunks.append(
+                        {"offset": time.perf_counter() - started, "chunk": _dump_chunk(chunk)}
+                    )
+                    yield chunk
+            finally:
+                self._append({"kind": "chat_stream", "key": key, "chunks": chunks})
+
+        return _stream
+
+    def _wrap_astream(self, original):
+        async def _astream(model, messages, stop=None, run_manager=None, **kwargs):
+            key = _chat_key(model, messages, stop, kwargs)
+            if self.mode == "replay":
+                started = time.perf_counter()
+                for item in self._take("chat_stream", key)["chunks"]:
+                    await asyncio.sleep(
+                        max(0.0, self._delay(item["offset"]) - (time.perf_counter() - started))
+                    )
+                    chunk = _load_chunk(item["chunk"])
+                    if run_manager:
+                        await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                    yield chunk
+                return
+
+            started = time.perf_counter()
+            chunks = []
+            try:
+                async for chunk in original(model, messages, stop, run_manager, **kwargs):
+                    chunks.append(
+                        {"offset": time.perf_counter() - started, "chunk": _dump_chunk(chunk)}
+                    )
+                    yield chunk
+            finally:
+                self._append({"kind": "chat_stream", "key": key, "chunks": chunks})
+
+        return _astream
+
+    # -- TavilySearch ---------------------------------------------------------
+
+    def _wrap_search(self, original):
+        def _run(tool, *args, run_manager=None, **kwargs):
+            key = _digest([args, kwargs])
+            if self.mode == "replay":
+                interaction = self._take("search", key)
+                time.sleep(self._delay(interaction["latency"]))
+                return interaction["result"]
+
+            started = time.perf_counter()
+            result = original(tool, *args, run_manager=run_manager, **kwargs)
+            self._append(
+                {
+                    "kind": "search",
+                    "key": key,
+                    "latency": time.perf_counter() - started,
+                    "result": result,
+                }
+            )
+            return result
+
+        return _run
+
+    def _wrap_asearch(self, original):
+        async def _arun(tool, *args, run_manager=None, **kwargs):
+            key = _digest([args, kwargs])
+            if self.mode == "replay":
+                interaction = self._take("search", key)
+                await asyncio.sleep(self._delay(interaction["latency"]))
+                return interaction["result"]
+
+            started = time.perf_counter()
+            result = await original(tool, *args, run_manager=run_manager, **kwargs)
+            self._append(
+                {
+                    "kind": "search",
+                    "key": key,
+                    "latency": time.perf_counter() - started,
+                    "result": result,
+                }
+            )
+            return result
+
+        return _arun
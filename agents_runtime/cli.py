@@ -0,0 +1,113 @@
+"""
+Command line options shared by every entry point.
+
+    args = parse_runtime_args("Reflexion agent")
+    with runtime_session(args, "reflexion") as config:
+        result = graph.invoke(inputs, config=config)
+
+`runtime_session` yields the RunnableConfig (callbacks) to pass to the run.
+"""
+
+import argparse
+from collections.abc import Iterator
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from langchain_core.runnables import RunnableConfig
+
+from agents_runtime.cascade import cascade_report
+from agents_runtime.cassette import Cassette
+from agents_runtime.profiling import SamplingProfiler
+from agents_runtime.prompt_cache import PromptCacheTracker
+from agents_runtime.resilience import resilience_report, save_latencies
+
+PROFILES_DIR = Path(__file__).resolve().parents[1] / "profiles"
+
+
+def parse_runtime_args(description: str | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="sample the run and split each node's time into CPU and I/O wait "
+        f"(folded stacks + summary written to {PROFILES_DIR.name}/)",
+    )
+    parser.add_argument(
+        "--profile-interval",
+        type=float,
+        default=0.005,
+        help="sampling interval in seconds (default: 0.005)",
+    )
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument(
+        "--record",
+        metavar="CASSETTE",
+        type=Path,
+        help="record every model and search call of the run into CASSETTE (JSON)",
+    )
+    cassette.add_argument(
+        "--replay",
+        metavar="CASSETTE",
+        type=Path,
+        help="serve model and search calls from CASSETTE, without network",
+    )
+    parser.add_argument(
+        "--zero-latency",
+        action="store_true",
+        help="with --replay, answer instantly instead of reproducing recorded latencies",
+    )
+    return parser.parse_args()
+
+
+@contextmanager
+def runtime_session(args: argparse.Namespace, name: str) -> Iterator[RunnableConfig]:
+    profiler = None
+    prompt_cache = PromptCacheTracker()
+    config: RunnableConfig = {"callbacks": [prompt_cache]}
+
+    with ExitStack() as stack:
+        if args.record or args.replay:
+            cassette = Cassette(
+                args.record or args.replay,
+                mode="record" if args.record else "replay",
+                latency="zero" if args.zero_latency else "recorded",
+            )
+            stack.enter_context(cassette)
+            config["callbacks"].append(cassette.output_capture)
+
+        if args.profile:
+            profiler = SamplingProfiler(interval=args.profile_interval)
+            config["callbacks"].append(profiler.tracker)
+            profiler.start()
+
+        try:
+            yield config
+        finally:
+            if profiler is not None:
+                profiler.stop()
+                _write_profile(profiler, name)
+            if report := cascade_report():
+                print("\n🪜 MODEL CASCADE\n" + report)
+            if report := resilience_report():
+                print("\n🛡️ RESILIENCE\n" + report)
+            # replayed latencies are not the API's: they would skew the next timeouts
+            if not args.replay:
+                save_latencies()
+            if report := prompt_cache.report():
+                print("\n💾 PROMPT CACHE\n" + report)
+
+
+def _write_profile(profiler: SamplingProfiler, name: str) -> None:
+    PROFILES_DIR.mkdir(exist_ok=True)
+    stem = PROFILES_DIR / f"{name}-{datetime.now():%Y%m%d-%H%M%S}"
+    summary = profiler.summary()
+
+    profiler.write_folded(stem.with_suffix(".folded"))
+    stem.with_suffix(".txt").write_text(summary + "\n")
+
+    print("\n" + "=" * 50)
+    print(f"⏱️  PROFILE ({name})")
+    print("=" * 50)
+    print(summary)
+    print(f"\nFlamegraph input: {stem.with_suffix('.folded')}")
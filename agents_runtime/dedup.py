@@ -0,0 +1,107 @@
+"""
+Near-duplicate detection for search results (word shingling + MinHash).
+
+Search passes often bring back the same page, or the same snippet syndicated
+under another URL. `NearDuplicateIndex` keeps a MinHash signature per document
+and tells whether a new text is a near-duplicate (estimated Jaccard similarity
+of their word shingles above `threshold`) of a document already indexed.
+"""
+
+import hashlib
+import random
+import re
+from functools import cache
+from typing import TypedDict
+
+import tiktoken
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD = re.compile(r"\w+")
+
+
+class DedupStats(TypedDict, total=False):
+    """What duplicate suppression removed from the state."""
+
+    results_kept: int
+    results_dropped: int
+    results_collapsed: int
+    bytes_saved: int
+    tokens_saved: int
+
+
+def add_stats(left: DedupStats | None, right: DedupStats | None) -> DedupStats:
+    """State reducer: sums two stats key by key."""
+    left = left or {}
+    right = right or {}
+    return {key: left.get(key, 0) + right.get(key, 0) for key in DedupStats.__annotations__}
+
+
+@cache
+def _encoding() -> tiktoken.Encoding | None:
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:  # the encoding file is downloaded on first use
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Tokens of `text` for the gpt-4o family (o200k_base), or a 4 bytes per
+    token estimate when the encoding cannot be loaded (offline runs).
+    """
+    encoding = _encoding()
+    if encoding is None:
+        return len(text.encode()) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def shingles(text: str, size: int = 5) -> set[str]:
+    """Overlapping word `size`-grams of the normalized text."""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+class NearDuplicateIndex:
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, shingle_size: int = 5):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        # fixed seed: signatures must be comparable across runs
+        rng = random.Random(42)
+        self._permutations = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+        self._signatures: dict[str, tuple[int, ...]] = {}
+
+    def signature(self, text: str) -> tuple[int, ...]:
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+            for shingle in shingles(text, self.shingle_size)
+        ]
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._permutations
+        )
+
+    @staticmethod
+    def similarity(left: tuple[int, ...], right: tuple[int, ...]) -> float:
+        """Estimated Jaccard similarity of the two underlying shingle sets."""
+        return sum(a == b for a, b in zip(left, right, strict=True)) / len(left)
+
+    def add(self, key: str, text: str) -> str | None:
+        """
+        Indexes `text` under `key`, unless it is a near-duplicate of an indexed
+        document: the key of that document is returned instead.
+        """
+        signature = self.signature(text)
+        for other_key, other in self._signatures.items():
+            if self.similarity(signature, other) >= self.threshold:
+                return other_key
+        self._signatures[key] = signature
+        return None
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._signatures
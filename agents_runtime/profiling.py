@@ -0,0 +1,291 @@
+"""
+Sampling profiler that splits each node's wall time into CPU and I/O wait.
+
+A background thread samples the stack of every thread at a fixed interval.
+Each sample is classified as CPU when the thread's own CPU clock advanced
+during the interval, as I/O wait otherwise, and attributed to the LangGraph
+node running on that thread (tracked by `NodeTracker` through callbacks).
+
+Samples of the main thread outside any node are reported as "(graph runtime)":
+it is where LangGraph schedules tasks and merges state updates (add_messages).
+A node whose work spans several threads (ToolNode's pool) is counted once
+per sample: as CPU if any of its threads is on CPU, as I/O wait otherwise.
+
+Async nodes share the event loop thread, so they are tracked per task: the
+node stack lives in a context variable, which the tasks a node creates
+inherit. A sample of the loop thread goes to the node of the task running at
+that instant. The other async nodes in progress are awaiting, and are counted
+as I/O wait. Sync code that an async node sends to the loop's default executor
+(sync nodes, REPL tools) is attributed to that node via the executor threads.
+
+Outputs:
+- a folded-stacks file (`node;[cpu];module:function;... count`) readable by
+  flamegraph.pl, speedscope or inferno
+- a summary table per node
+"""
+
+import asyncio
+import contextvars
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+from uuid import UUID, uuid4
+
+from langchain_core.callbacks import BaseCallbackHandler
+from tabulate import tabulate
+
+GRAPH_RUNTIME = "(graph runtime)"
+
+# Leaf functions treated as blocking when the thread CPU clock is unavailable
+_BLOCKING_FUNCTIONS = {
+    "select", "poll", "epoll", "recv", "recv_into", "read", "readinto",
+    "wait", "sleep", "acquire", "accept", "connect", "do_handshake",
+}  # fmt: skip
+
+
+# (run_id, node) of the runs enclosing the current code, inherited by child tasks
+_NODE_STACK: contextvars.ContextVar[tuple[tuple[UUID, str], ...]] = contextvars.ContextVar(
+    "langgraph_node_stack", default=()
+)
+
+
+class _NodeAwareExecutor(ThreadPoolExecutor):
+    """Default executor of the event loop: each job keeps the node of the task that submitted it."""
+
+    def __init__(self, tracker: "NodeTracker") -> None:
+        super().__init__(thread_name_prefix="asyncio")
+        self.tracker = tracker
+
+    def submit(self, fn, /, *args, **kwargs):
+        # called from the submitting task: its node stack is the current one
+        return super().submit(self.tracker.run_in_thread, _NODE_STACK.get(), fn, *args, **kwargs)
+
+
+class NodeTracker(BaseCallbackHandler):
+    """Knows which LangGraph node runs on each thread, or in each asyncio task."""
+
+    # called in the run's own thread / task, not in an executor thread, so that
+    # the node stack (a context variable) is the one of the code being run
+    run_inline = True
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # sync runs: per thread, the node stack at each run start
+        self._stacks: dict[int, list[tuple[UUID, tuple]]] = defaultdict(list)
+        self._runs: dict[UUID, int] = {}
+        # async runs in progress: node stack at their start
+        self._async_runs: dict[UUID, tuple] = {}
+        # event loop of each thread that ran async nodes
+        self._loops: dict[int, asyncio.AbstractEventLoop] = {}
+        self._active: set[UUID] = set()
+
+    def _path(self, stack: tuple[tuple[UUID, str], ...]) -> str | None:
+        # nested subgraph nodes read as "tools/agent"; child runnables of a
+        # node share its name, so consecutive duplicates are collapsed. A run
+        # that ended in another context may linger in a stack: it is skipped
+        names = [name for run_id, name in stack if run_id in self._active]
+        path = [name for i, name in enumerate(names) if i == 0 or names[i - 1] != name]
+        return "/".join(path) or None
+
+    def current_node(self, thread_id: int) -> str | None:
+        """Node running on the thread now (for a loop thread, the node of the current task)."""
+        with self._lock:
+            loop = self._loops.get(thread_id)
+            if loop is not None:
+                task = asyncio.current_task(loop)
+                if task is not None:
+                    path = self._path(task.get_context().get(_NODE_STACK, ()))
+                    if path is not None:
+                        return path
+            stack = self._stacks.get(thread_id)
+            if not stack:
+                return None
+            return self._path(stack[-1][1])
+
+    def run_in_thread(self, stack: tuple, fn, *args, **kwargs):
+        """Runs `fn` in this thread on behalf of the nodes of `stack`."""
+        job_id = uuid4()
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._stacks[thread_id].append((job_id, stack))
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                entries = self._stacks[thread_id]
+                entries[:] = [entry for entry in entries if entry[0] != job_id]
+
+    def _watch_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        thread_id = threading.get_ident()
+        if thread_id in self._loops:
+            return
+        self._loops[thread_id] = loop
+        # an executor the loop already has is kept (its jobs stay unattributed)
+        if getattr(loop, "_default_executor", None) is None:
+            loop.set_default_executor(_NodeAwareExecutor(self))
+
+    def awaiting_nodes(self) -> set[str]:
+        """Async nodes in progress (innermost ones only, not their parent graph nodes)."""
+        with self._lock:
+            paths = {self._path(stack) for stack in self._async_runs.values()} - {None}
+        return {path for path in paths if not any(other.startswith(path + "/") for other in paths)}
+
+    def _push(self, run_id: UUID, metadata: dict[str, Any] | None) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        if not node:
+            return
+        stack = (*_NODE_STACK.get(), (run_id, node))
+        _NODE_STACK.set(stack)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._active.add(run_id)
+            if loop is not None:
+                self._watch_loop(loop)
+                self._async_runs[run_id] = stack
+            else:
+                self._stacks[thread_id].append((run_id, stack))
+                self._runs[run_id] = thread_id
+
+    def _pop(self, run_id: UUID) -> None:
+        _NODE_STACK.set(tuple(entry for entry in _NODE_STACK.get() if entry[0] != run_id))
+        with self._lock:
+            self._active.discard(run_id)
+            self._async_runs.pop(run_id, None)
+            thread_id = self._runs.pop(run_id, None)
+            if thread_id is not None:
+                # remove this run wherever it sits rather than popping the top
+                stack = self._stacks[thread_id]
+                stack[:] = [entry for entry in stack if entry[0] != run_id]
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):  # noqa: ARG002
+        self._push(run_id, metadata)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, metadata=None, **kwargs):  # noqa: ARG002
+        self._push(run_id, metadata)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):  # noqa: ARG002
+        self._pop(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):  # noqa: ARG002
+        self._pop(run_id)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):  # noqa: ARG002
+        self._pop(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):  # noqa: ARG002
+        self._pop(run_id)
+
+
+def _thread_cpu_time(thread_id: int) -> float | None:
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(thread_id))
+    except (AttributeError, OSError):
+        return None
+
+
+def _fold(frame) -> str:
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        module = frame.f_globals.get("__name__", Path(code.co_filename).stem)
+        frames.append(f"{module}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+
+class SamplingProfiler:
+    """Samples all threads every `interval` seconds between `start()` and `stop()`."""
+
+    def __init__(self, interval: float = 0.005, tracker: NodeTracker | None = None) -> None:
+        self.interval = interval
+        self.tracker = tracker or NodeTracker()
+        self.stacks: Counter[str] = Counter()
+        self.samples: dict[str, Counter[str]] = defaultdict(Counter)
+        self.seconds: dict[str, Counter[str]] = defaultdict(Counter)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._cpu: dict[int, float] = {}
+
+    def start(self) -> None:
+        self._main_thread = threading.main_thread().ident
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            self._sample(now - last)
+            last = now
+
+    def _sample(self, elapsed: float) -> None:
+        states: dict[str, set[str]] = defaultdict(set)
+        awaiting = self.tracker.awaiting_nodes()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == self._thread.ident:
+                continue
+            # the CPU clock baseline is kept for every thread, even idle ones,
+            # so the first sample of a node does not inherit older CPU time
+            cpu = _thread_cpu_time(thread_id)
+            previous = self._cpu.get(thread_id, cpu)
+            if cpu is not None:
+                self._cpu[thread_id] = cpu
+
+            node = self.tracker.current_node(thread_id)
+            if node is None:
+                if thread_id != self._main_thread:
+                    continue  # idle pool threads
+                node = GRAPH_RUNTIME
+
+            if cpu is not None:
+                state = "cpu" if cpu - previous >= elapsed / 2 else "io"
+            else:
+                state = "io" if frame.f_code.co_name in _BLOCKING_FUNCTIONS else "cpu"
+
+            if node == GRAPH_RUNTIME and state == "io" and awaiting:
+                continue  # the event loop waits in select for the awaiting nodes, counted below
+
+            self.stacks[f"{node};[{state}];{_fold(frame)}"] += 1
+            self.samples[node][state] += 1
+            states[node].add(state)
+
+        # async nodes not running right now are awaiting (model, search, sleep)
+        for node in awaiting - states.keys():
+            self.stacks[f"{node};[io];(await)"] += 1
+            self.samples[node]["io"] += 1
+            states[node].add("io")
+
+        for node, node_states in states.items():
+            self.seconds[node]["cpu" if "cpu" in node_states else "io"] += elapsed
+
+    def write_folded(self, path: Path) -> None:
+        path.write_text("".join(f"{stack} {count}\n" for stack, count in self.stacks.items()))
+
+    def summary(self) -> str:
+        rows = []
+        for node, seconds in sorted(self.seconds.items(), key=lambda item: -sum(item[1].values())):
+            total = seconds["cpu"] + seconds["io"]
+            rows.append(
+                [
+                    node,
+                    sum(self.samples[node].values()),
+                    f"{total:.2f}",
+                    f"{seconds['cpu']:.2f}",
+                    f"{seconds['io']:.2f}",
+                    f"{100 * seconds['io'] / total:.0f}%" if total else "-",
+                ]
+            )
+        return tabulate(
+            rows, headers=["node", "samples", "time (s)", "cpu (s)", "io wait (s)", "io %"]
+        )
@@ -0,0 +1,113 @@
+"""
+Offline performance and correctness regression run over recorded cassettes.
+
+    # record once, with network
+    uv run python agents_advanced/reflexion_agent/main.py --record cassettes/reflexion.json
+
+    # replay every cassette, without network
+    uv run python -m agents_runtime.regression
+    uv run python -m agents_runtime.regression cassettes/reflexion.json --recorded-latency
+
+Each cassette is replayed by running its entry point in a subprocess (the
+agents import sibling modules with the same names, e.g. `chains`). A cassette
+passes when the run makes exactly the recorded requests (a changed prompt
+fails it) and reproduces the recorded final state.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from tabulate import tabulate
+
+from agents_runtime.cassette import REPO_ROOT, REPORT_ENV
+
+CASSETTES_DIR = REPO_ROOT / "cassettes"
+
+
+def replay(cassette: Path, recorded_latency: bool) -> dict:
+    entry = json.loads(cassette.read_text())["entry"]
+    with tempfile.TemporaryDirectory() as tmp:
+        report_path = Path(tmp) / "report.json"
+        env = {
+            **os.environ,
+            REPORT_ENV: str(report_path),
+            # the agents build their clients at import time, offline any key will do
+            "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "replay"),
+            "TAVILY_API_KEY": os.getenv("TAVILY_API_KEY", "replay"),
+        }
+        command = [sys.executable, entry, "--replay", str(cassette.resolve())]
+        if not recorded_latency:
+            command.append("--zero-latency")
+        process = subprocess.run(command, cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+
+        if process.returncode != 0 or not report_path.exists():
+            # LangGraph appends a "During task with name ..." note after the error
+            lines = [
+                line
+                for line in process.stderr.strip().splitlines()
+                if not line.startswith("During task")
+            ]
+            return {"entry": entry, "error": lines[-1:]}
+        return json.loads(report_path.read_text())
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Replay recorded cassettes offline")
+    parser.add_argument(
+        "cassettes",
+        nargs="*",
+        type=Path,
+        help=f"cassettes to replay (default: {CASSETTES_DIR.name}/*.json)",
+    )
+    parser.add_argument(
+        "--recorded-latency",
+        action="store_true",
+        help="reproduce the recorded latencies instead of answering instantly",
+    )
+    args = parser.parse_args()
+
+    cassettes = args.cassettes or sorted(CASSETTES_DIR.glob("*.json"))
+    if not cassettes:
+        print(f"No cassette found in {CASSETTES_DIR}")
+        return 1
+
+    rows = []
+    failed = False
+    for cassette in cassettes:
+        report = replay(cassette, args.recorded_latency)
+        if "error" in report:
+            status = f"ERROR {' '.join(report['error'])}"
+        elif report.get("mismatched_calls"):
+            status = f"REQUEST CHANGED ({', '.join(report['mismatched_calls'])})"
+        elif not report["output_matches"]:
+            status = "OUTPUT DIFFERS"
+        else:
+            status = "ok"
+        failed |= status != "ok"
+        rows.append(
+            [
+                cassette.name,
+                report["entry"],
+                status,
+                f"{report['wall_time']:.2f}" if "wall_time" in report else "-",
+                report.get("recorded_wall_time", "-"),
+                report.get("unused_interactions", "-"),
+            ]
+        )
+
+    print(
+        tabulate(
+            rows,
+            headers=["cassette", "entry", "status", "replay (s)", "recorded (s)", "unused calls"],
+        )
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
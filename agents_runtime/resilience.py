@@ -0,0 +1,479 @@
+"""
+Adaptive timeouts, hedged requests and jittered retries per node.
+
+A few slow model or search responses make the p99 of a whole run. For each
+node, the latencies of its calls are tracked, and from their p95:
+
+- the timeout of a call is `timeout_multiplier` x p95 (within
+  [min_timeout, max_timeout]). Before `min_samples` calls, `default_timeout`
+  is used,
+- a hedged duplicate of the call is sent if it has not answered after
+  `hedge_delay` seconds (the p95 by default). The first answer wins and the
+  other request is cancelled,
+- a call that times out or fails on a transient error is retried after
+  a full-jitter exponential backoff.
+
+`ResilientChatModel` wraps a chat model (ChatOpenAI, CascadeChatModel) with
+this policy. A streamed call (astream) is hedged and timed out on its first
+chunk. The chunks that follow are not retried, because they have already been
+handed to the caller. `ahedged` / `hedged` apply it to any call, e.g. a search.
+
+In the sync path a losing request cannot be cancelled from another thread.
+It is abandoned, so `call` must pass the timeout on to its client (as
+`ResilientChatModel` does) for it to be bounded. A client without a timeout
+(e.g. Tavily) goes through `ahedged`, where the loser is cancelled.
+
+The wrapped models should be built with `max_retries=0`, otherwise the
+OpenAI client retries on its own beneath this layer.
+
+A CLI run makes only a few calls per node, fewer than `min_samples`. The
+latency windows are therefore kept between runs: `runtime_session` saves them
+(`save_latencies`, not after a replay) to `.resilience/latencies.json`, and a
+node starts from its stored window. AGENT_RESILIENCE_STORE=<path> moves the
+store, and an empty value disables it, e.g. for runs against the stub server.
+
+`resilience_report()` gives the latencies, hedges and retries per node, and
+`python -m agents_runtime.stub_server` reproduces a latency tail locally.
+"""
+
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any
+
+import aiohttp
+import httpx
+import openai
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+from pydantic import BaseModel, Field
+from tabulate import tabulate
+
+from agents_runtime.cascade import _child_config
+
+# errors worth another attempt; anything else (bad request, auth) is raised at once
+RETRYABLE_ERRORS = (
+    TimeoutError,
+    httpx.TransportError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    aiohttp.ClientError,  # Tavily (async client)
+)
+
+
+class ResiliencePolicy(BaseModel):
+    """Timeouts, hedging and retries of a node."""
+
+    default_timeout: float = Field(default=60.0, description="timeout before min_samples calls")
+    timeout_multiplier: float = Field(default=3.0, description="timeout = multiplier x p95")
+    min_timeout: float = Field(default=5.0, description="lower bound of the adaptive timeout")
+    max_timeout: float = Field(default=120.0, description="upper bound of the adaptive timeout")
+    hedge: bool = Field(default=True, description="send a duplicate of slow calls")
+    hedge_delay: float | None = Field(
+        default=None, description="seconds before hedging, None = observed p95"
+    )
+    min_samples: int = Field(default=10, description="calls observed before trusting the p95")
+    max_retries: int = Field(default=2, description="retries after a timeout or transient error")
+    backoff_base: float = Field(default=0.5, description="first backoff ceiling, in seconds")
+    backoff_max: float = Field(default=8.0, description="backoff ceiling, in seconds")
+
+    @classmethod
+    def from_env(cls, prefix: str = "AGENT_RESILIENCE_", **defaults: Any) -> "ResiliencePolicy":
+        """
+        Builds the policy from `defaults`, overridden by environment variables
+        such as AGENT_RESILIENCE_HEDGE_DELAY=1.5 or AGENT_RESILIENCE_HEDGE=false.
+        """
+        values = dict(defaults)
+        for name in cls.model_fields:
+            raw = os.getenv(f"{prefix}{name.upper()}")
+            if raw is not None:
+                values[name] = raw
+        return cls(**values)
+
+    def backoff(self, attempt: int) -> float:
+        """Full jitter: uniform in [0, min(backoff_max, backoff_base x 2^attempt)]."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+
+class NodeResilienceStats:
+    def __init__(self, window: int = 200) -> None:
+        self.lock = threading.Lock()
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+        self.retries = 0
+
+    def record(self, seconds: float) -> None:
+        with self.lock:
+            self.latencies.append(seconds)
+
+    def percentile(self, q: float, min_samples: int = 1) -> float | None:
+        """Latency at quantile `q` of the last calls, None below `min_samples`."""
+        with self.lock:
+            latencies = sorted(self.latencies)
+        if len(latencies) < max(min_samples, 1):
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def timeout(self, policy: ResiliencePolicy) -> float:
+        p95 = self.percentile(0.95, policy.min_samples)
+        if p95 is None:
+            return policy.default_timeout
+        return min(policy.max_timeout, max(policy.min_timeout, policy.timeout_multiplier * p95))
+
+    def hedge_delay(self, policy: ResiliencePolicy) -> float | None:
+        """Seconds before hedging, None to not hedge (yet)."""
+        if not policy.hedge:
+            return None
+        if policy.hedge_delay is not None:
+            return policy.hedge_delay
+        return self.percentile(0.95, policy.min_samples)
+
+
+# stats by node, shared by the copies bind_tools() makes of a wrapped model
+RESILIENCE_STATS: dict[str, NodeResilienceStats] = {}
+
+# latency windows kept between runs, by node
+LATENCY_STORE_ENV = "AGENT_RESILIENCE_STORE"
+DEFAULT_LATENCY_STORE = Path(__file__).resolve().parents[1] / ".resilience" / "latencies.json"
+
+
+def _latency_store() -> Path | None:
+    raw = os.getenv(LATENCY_STORE_ENV)
+    if raw is None:
+        return DEFAULT_LATENCY_STORE
+    return Path(raw) if raw else None
+
+
+@functools.cache
+def _stored_latencies() -> dict[str, list[float]]:
+    path = _latency_store()
+    if path is None or not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text())
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def node_stats(node: str) -> NodeResilienceStats:
+    stats = RESILIENCE_STATS.get(node)
+    if stats is None:
+        stats = NodeResilienceStats()
+        stats.latencies.extend(_stored_latencies().get(node, []))
+        stats = RESILIENCE_STATS.setdefault(node, stats)
+    return stats
+
+
+def save_latencies() -> None:
+    """Stores the latency windows of the nodes called in this run, for the next runs."""
+    path = _latency_store()
+    used = {node: stats for node, stats in RESILIENCE_STATS.items() if stats.calls}
+    if path is None or not used:
+        return
+    windows = dict(_stored_latencies())
+    for node, stats in used.items():
+        with stats.lock:
+            windows[node] = [round(seconds, 4) for seconds in stats.latencies]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(windows))
+
+
+async def _timed[T](call: Awaitable[T]) -> tuple[T, float]:
+    started = time.perf_counter()
+    result = await call
+    return result, time.perf_counter() - started
+
+
+async def _arace[T](
+    stats: NodeResilienceStats,
+    call: Callable[[float], Awaitable[T]],
+    timeout: float,
+    hedge_delay: float | None,
+    discard: Callable[[T], Awaitable[None]] | None,
+) -> T:
+    """One attempt: the call, its hedge if slow, the first answer wins."""
+    deadline = time.perf_counter() + timeout
+    tasks = [asyncio.ensure_future(_timed(call(timeout)))]
+    try:
+        if hedge_delay is not None and hedge_delay < timeout:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if not done:
+                stats.hedges += 1
+                tasks.append(asyncio.ensure_future(_timed(call(timeout))))
+
+        pending = set(tasks)
+        error: BaseException | None = None
+        while pending:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is not None:
+                    error = error or task.exception()
+                    continue
+                result, seconds = task.result()
+                stats.record(seconds)
+                if task is not tasks[0]:
+                    stats.hedge_wins += 1
+                # both requests may have answered in the same wake-up
+                for other in done - {task}:
+                    if discard is not None and other.exception() is None:
+                        await discard(other.result()[0])
+                return result
+        if error is not None and not pending:
+            raise error
+        stats.timeouts += 1
+        raise TimeoutError(f"no answer after {timeout:.1f}s")
+    finally:
+        # the loser (or every request, on timeout) is cancelled
+        for task in tasks:
+            task.cancel()
+
+
+async def ahedged[T](
+    node: str,
+    call: Callable[[float], Awaitable[T]],
+    policy: ResiliencePolicy | None = None,
+    discard: Callable[[T], Awaitable[None]] | None = None,
+) -> T:
+    """
+    Runs `call(timeout)` with the adaptive timeout, hedging and retries of
+    `node`. `discard` releases a result that lost the race (e.g. closes a stream).
+    """
+    policy = policy or ResiliencePolicy.from_env()
+    stats = node_stats(node)
+    stats.calls += 1
+    for attempt in range(policy.max_retries + 1):
+        try:
+            return await _arace(
+                stats, call, stats.timeout(policy), stats.hedge_delay(policy), discard
+            )
+        except RETRYABLE_ERRORS:
+            if attempt == policy.max_retries:
+                raise
+            stats.retries += 1
+            await asyncio.sleep(policy.backoff(attempt))
+    raise AssertionError("unreachable")
+
+
+def _race[T](
+    stats: NodeResilienceStats,
+    executor: ThreadPoolExecutor,
+    call: Callable[[float], T],
+    timeout: float,
+    hedge_delay: float | None,
+) -> T:
+    deadline = time.perf_counter() + timeout
+
+    def submit() -> Future:
+        # the threads keep the callbacks / LangGraph context of the caller
+        context = contextvars.copy_context()
+        return executor.submit(context.run, lambda: _timed_sync(call, timeout))
+
+    futures = [submit()]
+    try:
+        if hedge_delay is not None and hedge_delay < timeout:
+            done, _ = wait(futures, timeout=hedge_delay)
+            if not done:
+                stats.hedges += 1
+                futures.append(submit())
+
+        pending = set(futures)
+        error: BaseException | None = None
+        while pending:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                result, seconds = future.result()
+                stats.record(seconds)
+                if future is not futures[0]:
+                    stats.hedge_wins += 1
+                return result
+        if error is not None and not pending:
+            raise error
+        stats.timeouts += 1
+        raise TimeoutError(f"no answer after {timeout:.1f}s")
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def _timed_sync[T](call: Callable[[float], T], timeout: float) -> tuple[T, float]:
+    started = time.perf_counter()
+    result = call(timeout)
+    return result, time.perf_counter() - started
+
+
+def hedged[T](
+    node: str,
+    call: Callable[[float], T],
+    policy: ResiliencePolicy | None = None,
+) -> T:
+    """Sync `ahedged`: the call and its hedge run in threads."""
+    policy = policy or ResiliencePolicy.from_env()
+    stats = node_stats(node)
+    stats.calls += 1
+    # no `with`: shutting down would wait for an abandoned loser
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix=f"hedge-{node}")
+    try:
+        for attempt in range(policy.max_retries + 1):
+            try:
+                return _race(
+                    stats, executor, call, stats.timeout(policy), stats.hedge_delay(policy)
+                )
+            except RETRYABLE_ERRORS:
+                if attempt == policy.max_retries:
+                    raise
+                stats.retries += 1
+                time.sleep(policy.backoff(attempt))
+        raise AssertionError("unreachable")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ResilientChatModel(BaseChatModel):
+    node: str
+    model: Runnable
+    policy: ResiliencePolicy = Field(default_factory=ResiliencePolicy)
+
+    @property
+    def _llm_type(self) -> str:
+        return "resilient"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "ResilientChatModel":
+        return self.model_copy(update={"model": self.model.bind_tools(tools, **kwargs)})
+
+    @staticmethod
+    def _result(message: BaseMessage) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        config = _child_config(run_manager)
+        message = hedged(
+            self.node,
+            # the client timeout also stops an abandoned request
+            lambda timeout: self.model.invoke(
+                messages, config, stop=stop, timeout=timeout, **kwargs
+            ),
+            self.policy,
+        )
+        return self._result(message)
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        config = _child_config(run_manager)
+        message = await ahedged(
+            self.node,
+            lambda timeout: self.model.ainvoke(
+                messages, config, stop=stop, timeout=timeout, **kwargs
+            ),
+            self.policy,
+        )
+        return self._result(message)
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        config = _child_config(run_manager)
+
+        async def first_chunk(timeout: float):
+            stream = aiter(
+                self.model.astream(messages, config, stop=stop, timeout=timeout, **kwargs)
+            )
+            try:
+                return await anext(stream), stream
+            except BaseException:
+                await stream.aclose()
+                raise
+
+        async def close(result) -> None:
+            await result[1].aclose()
+
+        chunk, stream = await ahedged(self.node, first_chunk, self.policy, discard=close)
+        try:
+            yield ChatGenerationChunk(message=chunk)
+            async for chunk in stream:
+                yield ChatGenerationChunk(message=chunk)
+        finally:
+            await stream.aclose()
+
+
+def resilient(
+    node: str, model: Runnable, policy: ResiliencePolicy | None = None
+) -> ResilientChatModel:
+    """`model` with the policy of `node`, overridable with AGENT_RESILIENCE_* variables."""
+    return ResilientChatModel(node=node, model=model, policy=policy or ResiliencePolicy.from_env())
+
+
+def resilience_report() -> str | None:
+    """Table of latencies, timeouts, hedges and retries per node, None if nothing ran."""
+    rows = []
+    for node, stats in RESILIENCE_STATS.items():
+        if not stats.calls:
+            continue
+        p50, p95, p99 = (stats.percentile(q) for q in (0.5, 0.95, 0.99))
+        rows.append(
+            [
+                node,
+                stats.calls,
+                *(f"{p:.2f}" if p is not None else "-" for p in (p50, p95, p99)),
+                stats.hedges,
+                stats.hedge_wins,
+                stats.timeouts,
+                stats.retries,
+            ]
+        )
+    if not rows:
+        return None
+    return tabulate(
+        rows,
+        headers=[
+            "node",
+            "calls",
+            "p50 (s)",
+            "p95 (s)",
+            "p99 (s)",
+            "hedges",
+            "hedge wins",
+            "timeouts",
+            "retries",
+        ],
+    )
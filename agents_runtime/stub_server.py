@@ -0,0 +1,388 @@
+"""
+Local OpenAI / Tavily stand-in that injects latency.
+
+    python -m agents_runtime.stub_server --port 8765 --tail-rate 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python agents_advanced/...
+
+Each request waits `latency` seconds (+/- 50%), or `tail_latency` with
+probability `tail_rate`, then answers a fixed text: `/v1/chat/completions`
+(JSON or SSE stream) and `/search` (Tavily, for TavilySearch(api_base_url=...)).
+
+Tool calls are emulated just enough for an agent loop to run: a request ending
+on a user message calls the first tool (or the forced one) once, with arguments
+built from its JSON schema; after that the stub answers text. Structured output
+(forced tool or `json_schema`) gets lists of one item on a user turn and empty
+lists afterwards, so a router delegates once then concludes. A user turn that
+names a tool whose result is already in the conversation ("what did
+python_repl print?") is answered from it, without a tool call: an agent that
+only received a summary of that result has to ask for it again. The stub is
+for timing and call counts, not for the agents' logic.
+
+The prompt cache is emulated like OpenAI's: the longest prefix (tools, then
+messages) already seen, by 128-token blocks from 1024 tokens, is reported as
+`cached_tokens`, and the cached share of the prompt is served twice as fast.
+
+    python -m agents_runtime.stub_server --bench 200
+
+runs the same calls against the stub with and without `ResilientChatModel`
+and compares their latency percentiles.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_openai import ChatOpenAI
+from tabulate import tabulate
+
+from agents_runtime.resilience import ResiliencePolicy, resilience_report, resilient
+
+STUB_ANSWER = "This answer comes from the stub server."
+
+# OpenAI caches prompts from 1024 tokens, by blocks of 128 tokens
+CACHE_MIN_TOKENS = 1024
+CACHE_BLOCK_TOKENS = 128
+
+
+class StubServer:
+    """Threaded HTTP server, usable as a context manager (port 0 = any free port)."""
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency: float = 0.2,
+        tail_latency: float = 3.0,
+        tail_rate: float = 0.05,
+    ) -> None:
+        self.latency = latency
+        self.tail_latency = tail_latency
+        self.tail_rate = tail_rate
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.prefixes: set[str] = set()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def delay(self) -> float:
+        self.requests += 1
+        if random.random() < self.tail_rate:
+            return self.tail_latency
+        return self.latency * random.uniform(0.5, 1.5)
+
+    def cached_tokens(self, body: dict) -> int:
+        """Tokens of the longest prompt prefix seen before (and remembers this prompt)."""
+        prompt = _prompt_text(body)
+        block = CACHE_BLOCK_TOKENS * 4  # ~4 characters per token
+        digest = hashlib.sha256()
+        cached, hit = 0, True
+        with self.lock:
+            for end in range(block, len(prompt) + 1, block):
+                digest.update(prompt[end - block : end].encode())
+                key = digest.hexdigest()
+                if hit and key in self.prefixes:
+                    cached = end
+                else:
+                    hit = False
+                    self.prefixes.add(key)
+        tokens = cached // 4
+        return tokens if tokens >= CACHE_MIN_TOKENS else 0
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args) -> None:  # silence the access log
+                pass
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])) or b"{}")
+                is_chat = self.path.endswith("/chat/completions")
+                usage = _usage(body, server.cached_tokens(body)) if is_chat else None
+                delay = server.delay()
+                if usage and usage["prompt_tokens"]:
+                    # the cached part of the prompt is not processed again
+                    delay *= (
+                        1
+                        - 0.5
+                        * usage["prompt_tokens_details"]["cached_tokens"]
+                        / usage["prompt_tokens"]
+                    )
+                time.sleep(delay)
+                try:
+                    if is_chat:
+                        self._chat(body, usage)
+                    elif self.path.endswith("/search"):
+                        self._json(_search_payload(body))
+                    else:
+                        self.send_error(404)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client gave up on this request (hedge lost, timeout)
+
+            def _json(self, payload: dict) -> None:
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _chat(self, body: dict, usage: dict) -> None:
+                if not body.get("stream"):
+                    self._json(_completion_payload(body, usage))
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for chunk in _completion_chunks(body, usage):
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+
+        return Handler
+
+    def __enter__(self) -> "StubServer":
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _prompt_text(body: dict) -> str:
+    return json.dumps([body.get("tools"), body.get("messages", [])])
+
+
+def _usage(body: dict, cached_tokens: int) -> dict:
+    prompt_tokens = len(_prompt_text(body)) // 4
+    completion_tokens = len(STUB_ANSWER) // 4
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached_tokens},
+    }
+
+
+def _completion_payload(body: dict, usage: dict) -> dict:
+    message = _reply(body)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [
+            {
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+            }
+        ],
+        "usage": usage,
+    }
+
+
+def _completion_chunks(body: dict, usage: dict) -> list[dict]:
+    base = {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+    }
+    message = _reply(body)
+    chunks = [{**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}}]}]
+    if message.get("tool_calls"):
+        tool_calls = [{"index": i, **call} for i, call in enumerate(message["tool_calls"])]
+        chunks.append({**base, "choices": [{"index": 0, "delta": {"tool_calls": tool_calls}}]})
+    else:
+        for word in message["content"].split(" "):
+            chunks.append({**base, "choices": [{"index": 0, "delta": {"content": word + " "}}]})
+    finish_reason = "tool_calls" if message.get("tool_calls") else "stop"
+    chunks.append({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]})
+    if (body.get("stream_options") or {}).get("include_usage"):
+        chunks.append({**base, "choices": [], "usage": usage})
+    return chunks
+
+
+def _reply(body: dict) -> dict:
+    """Assistant message answering `body`: fixed text, one tool call or structured JSON."""
+    messages = body.get("messages") or []
+    text = _last_user_text(messages)
+    user_turn = (
+        bool(messages)
+        and messages[-1].get("role") == "user"
+        and not (_tool_results(messages) & set(re.findall(r"\w+", text.lower())))
+    )
+
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        schema = response_format["json_schema"]["schema"]
+        value = _schema_value(schema, schema, text, user_turn)
+        return {"role": "assistant", "content": json.dumps(value)}
+
+    tools = {tool["function"]["name"]: tool["function"] for tool in body.get("tools") or []}
+    tool_choice = body.get("tool_choice")
+    if isinstance(tool_choice, dict):
+        name = tool_choice["function"]["name"]
+    elif tools and (user_turn or tool_choice == "required"):
+        name = next(iter(tools))
+    else:
+        return {"role": "assistant", "content": STUB_ANSWER}
+    schema = tools[name].get("parameters") or {}
+    arguments = _schema_value(schema, schema, text, user_turn)
+    return {
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [
+            {
+                "id": f"call_{uuid.uuid4().hex[:24]}",
+                "type": "function",
+                "function": {"name": name, "arguments": json.dumps(arguments)},
+            }
+        ],
+    }
+
+
+def _tool_results(messages: list[dict]) -> set[str]:
+    """Names (lowercase) of the tools whose result is in the conversation."""
+    calls = {
+        call["id"]: call["function"]["name"]
+        for message in messages
+        for call in message.get("tool_calls") or []
+    }
+    return {
+        calls[message["tool_call_id"]].lower()
+        for message in messages
+        if message.get("role") == "tool" and message.get("tool_call_id") in calls
+    }
+
+
+def _last_user_text(messages: list[dict]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            content = message.get("content") or ""
+            if isinstance(content, list):
+                return " ".join(part.get("text", "") for part in content)
+            return content
+    return STUB_ANSWER
+
+
+def _schema_value(schema: dict, root: dict, text: str, user_turn: bool):
+    """Value valid for a JSON schema: one item per list on a user turn, none afterwards."""
+    if "$ref" in schema:
+        schema = root.get("$defs", {})[schema["$ref"].rsplit("/", 1)[-1]]
+    if "anyOf" in schema:
+        options = [option for option in schema["anyOf"] if option.get("type") != "null"]
+        schema = options[0] if options else schema["anyOf"][0]
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "const" in schema:
+        return schema["const"]
+    match schema.get("type"):
+        case "object":
+            return {
+                name: _schema_value(field, root, text, user_turn)
+                for name, field in schema.get("properties", {}).items()
+            }
+        case "array":
+            return (
+                [_schema_value(schema.get("items", {}), root, text, user_turn)] if user_turn else []
+            )
+        case "integer" | "number":
+            return 1
+        case "boolean":
+            return True
+        case "null":
+            return None
+    return text
+
+
+def _search_payload(body: dict) -> dict:
+    query = body.get("query", "")
+    return {
+        "query": query,
+        "results": [
+            {
+                "url": f"https://stub.local/{i}/{uuid.uuid4().hex[:8]}",
+                "title": f"{query} ({i})",
+                "content": f"Stub result {i} for {query}.",
+                "score": 1 - i / 10,
+            }
+            for i in range(body.get("max_results", 3))
+        ],
+        "response_time": 0.0,
+    }
+
+
+def _percentiles(latencies: list[float]) -> list[str]:
+    latencies = sorted(latencies)
+    return [
+        f"{latencies[min(len(latencies) - 1, int(q * len(latencies)))]:.2f}"
+        for q in (0.5, 0.95, 0.99)
+    ] + [f"{latencies[-1]:.2f}"]
+
+
+async def bench(server: StubServer, calls: int) -> None:
+    model = ChatOpenAI(model="stub", base_url=f"{server.url}/v1", api_key="stub", max_retries=0)
+    variants = {
+        "plain": model,
+        "resilient": resilient("bench", model, ResiliencePolicy(min_samples=10)),
+    }
+
+    rows = []
+    for name, variant in variants.items():
+        latencies = []
+        for _ in range(calls):
+            started = time.perf_counter()
+            await variant.ainvoke("ping")
+            latencies.append(time.perf_counter() - started)
+        rows.append([name, calls, *_percentiles(latencies)])
+        print(f"   {name}: done")
+
+    print(
+        f"\n📊 LATENCY ({server.latency}s ± 50%, {server.tail_rate:.0%} at {server.tail_latency}s)"
+    )
+    print(tabulate(rows, headers=["model", "calls", "p50 (s)", "p95 (s)", "p99 (s)", "max (s)"]))
+    print("\n🛡️ RESILIENCE\n" + resilience_report())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="OpenAI / Tavily stub with injected latency")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="usual latency (s)")
+    parser.add_argument("--tail-latency", type=float, default=3.0, help="slow latency (s)")
+    parser.add_argument("--tail-rate", type=float, default=0.05, help="share of slow requests")
+    parser.add_argument(
+        "--bench", type=int, metavar="CALLS", help="compare plain and resilient calls, then exit"
+    )
+    args = parser.parse_args()
+
+    with StubServer(
+        port=0 if args.bench else args.port,
+        latency=args.latency,
+        tail_latency=args.tail_latency,
+        tail_rate=args.tail_rate,
+    ) as server:
+        if args.bench:
+            asyncio.run(bench(server, args.bench))
+            return
+        print(f"🧪 Stub server on {server.url} (OPENAI_BASE_URL={server.url}/v1)")
+        with contextlib.suppress(KeyboardInterrupt):
+            threading.Event().wait()
+
+
+if __name__ == "__main__":
+    main()